@@ -0,0 +1,350 @@
+"""
+Configuration
+One typed configuration for the order status tools, parsed and validated once.
+
+Settings are read from tesla_config.json (all keys optional) and the Telegram
+sink from telegram_config.json. Without a tesla_config.json a single 'default'
+account using the classic file names is configured.
+"""
+
+import difflib
+import json
+import os
+import re
+from dataclasses import asdict, dataclass, field, replace
+
+CONFIG_FILE = 'tesla_config.json'
+TELEGRAM_CONFIG_FILE = 'telegram_config.json'
+DEFAULT_ACCOUNT = 'default'
+DEFAULT_REDIRECT_URI = 'https://auth.tesla.com/void/callback'
+DEFAULT_APP_VERSION = '9.99.9-9999'  # we can use a dummy version here, as the API does not check it strictly
+DEFAULT_POLL_INTERVAL = 3600
+DEFAULT_MAX_CONCURRENCY = 4
+DEFAULT_HEARTBEAT_HOURS = 24
+DEFAULT_ORDER_DETAILS_TTL = 60
+DEFAULT_FULL_HISTORY_DAYS = 30
+DEFAULT_PURGE_AFTER_DAYS = 0  # keep delivered and cancelled orders forever
+DEFAULT_RETENTION_INTERVAL_HOURS = 24
+MIN_POLL_INTERVAL = 60
+
+LANGUAGE_PATTERN = re.compile(r'^[a-z]{2}([_-][A-Za-z]{2,4})?$')
+COUNTRY_PATTERN = re.compile(r'^[A-Z]{2}$')
+ACCOUNT_NAME_PATTERN = re.compile(r'^[A-Za-z0-9_.-]+$')
+
+# Keys of every object in the configuration files, anything else is most likely a typo
+CONFIG_KEYS = ('accounts', 'locale', 'poll_interval', 'max_concurrency', 'order_details_ttl', 'app_version',
+               'rate_limits', 'retention', 'sinks')
+ACCOUNT_KEYS = ('name', 'token_file', 'orders_file', 'history_file', 'locale', 'order_locales', 'redirect_uri')
+LOCALE_KEYS = ('language', 'country')
+RATE_LIMIT_KEYS = ('rate', 'burst')
+RETENTION_KEYS = ('full_history_days', 'purge_after_days', 'interval_hours')
+SINKS_KEYS = ('telegram',)
+TELEGRAM_SINK_KEYS = ('config_file',)
+TELEGRAM_KEYS = ('bot_token', 'chat_id', 'enabled', 'always_notify', 'heartbeat_hours')
+
+
+class ConfigError(ValueError):
+    """Raised when a configuration file is unreadable or invalid"""
+
+
+@dataclass(frozen=True)
+class Locale:
+    language: str = 'en'
+    country: str = 'DE'
+
+
+@dataclass(frozen=True)
+class AccountConfig:
+    name: str = DEFAULT_ACCOUNT
+    token_file: str = 'tesla_tokens.json'
+    orders_file: str = 'tesla_orders.db'
+    history_file: str = 'tesla_orders_history.jsonl'
+    locale: Locale = field(default_factory=Locale)
+    order_locales: dict = field(default_factory=dict)
+    redirect_uri: str = DEFAULT_REDIRECT_URI
+
+
+@dataclass(frozen=True)
+class TelegramConfig:
+    bot_token: str
+    chat_id: str
+    enabled: bool = True
+    always_notify: bool = False
+    heartbeat_hours: float = DEFAULT_HEARTBEAT_HOURS
+
+
+@dataclass(frozen=True)
+class RetentionConfig:
+    full_history_days: int = DEFAULT_FULL_HISTORY_DAYS
+    purge_after_days: int = DEFAULT_PURGE_AFTER_DAYS
+    interval_hours: int = DEFAULT_RETENTION_INTERVAL_HOURS
+
+
+@dataclass(frozen=True)
+class AppConfig:
+    accounts: tuple = (AccountConfig(),)
+    poll_interval: int = DEFAULT_POLL_INTERVAL
+    max_concurrency: int = DEFAULT_MAX_CONCURRENCY
+    order_details_ttl: int = DEFAULT_ORDER_DETAILS_TTL
+    app_version: str = DEFAULT_APP_VERSION
+    rate_limits: dict = field(default_factory=dict)
+    retention: RetentionConfig = field(default_factory=RetentionConfig)
+    telegram_config_file: str = TELEGRAM_CONFIG_FILE
+    telegram: TelegramConfig = None
+
+
+def file_stamp(path):
+    """Return a value that changes whenever the file is rewritten"""
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+def read_json_file(path):
+    """Read a JSON file, returns None if it does not exist"""
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except json.JSONDecodeError as e:
+        raise ConfigError(f"Invalid JSON in {path}: {e}") from e
+    except OSError as e:
+        raise ConfigError(f"Cannot read {path}: {e}") from e
+
+
+def _expect(condition, message):
+    if not condition:
+        raise ConfigError(message)
+
+
+def _known_keys(data, keys, where):
+    """Reject keys that are not part of the schema instead of silently using defaults"""
+    for key in data:
+        if key not in keys:
+            close = difflib.get_close_matches(key, keys, n=1)
+            hint = f", did you mean '{close[0]}'?" if close else f", expected one of: {', '.join(keys)}"
+            raise ConfigError(f"Unknown key '{key}' in {where}{hint}")
+
+
+def _positive_int(data, key, default, minimum=1):
+    value = data.get(key, default)
+    _expect(isinstance(value, int) and not isinstance(value, bool) and value >= minimum,
+            f"'{key}' must be an integer >= {minimum}")
+    return value
+
+
+def parse_locale(data, default=Locale()):
+    """Validate a locale mapping like {"language": "en", "country": "DE"}"""
+    if data is None:
+        return default
+    _expect(isinstance(data, dict), "'locale' must be an object")
+    _known_keys(data, LOCALE_KEYS, 'locale')
+    locale = Locale(language=data.get('language', default.language), country=data.get('country', default.country))
+    _expect(isinstance(locale.language, str) and LANGUAGE_PATTERN.match(locale.language),
+            f"Invalid locale language '{locale.language}'")
+    _expect(isinstance(locale.country, str) and COUNTRY_PATTERN.match(locale.country),
+            f"Invalid locale country '{locale.country}'")
+    return locale
+
+
+def parse_order_locales(data, default_locale):
+    """Validate {"reference number": {"language": ..., "country": ...}}"""
+    if data is None:
+        return {}
+    _expect(isinstance(data, dict), "'order_locales' must be an object")
+    return {reference_number: parse_locale(locale, default_locale) for reference_number, locale in data.items()}
+
+
+def order_locale(account, reference_number):
+    """Locale to fetch an order of the account in"""
+    return account.order_locales.get(reference_number, account.locale)
+
+
+def parse_account(data, default_locale):
+    """Validate one account entry"""
+    _expect(isinstance(data, dict), "Each account must be an object")
+    name = data.get('name', DEFAULT_ACCOUNT)
+    _expect(isinstance(name, str) and ACCOUNT_NAME_PATTERN.match(name), f"Invalid account name '{name}'")
+    _known_keys(data, ACCOUNT_KEYS, f"account '{name}'")
+
+    # The default account keeps the classic file names, others get their own
+    suffix = '' if name == DEFAULT_ACCOUNT else f'_{name}'
+    locale = parse_locale(data.get('locale'), default_locale)
+    account = AccountConfig(
+        name=name,
+        token_file=data.get('token_file', f'tesla_tokens{suffix}.json'),
+        orders_file=data.get('orders_file', f'tesla_orders{suffix}.db'),
+        history_file=data.get('history_file', f'tesla_orders_history{suffix}.jsonl'),
+        locale=locale,
+        order_locales=parse_order_locales(data.get('order_locales'), locale),
+        redirect_uri=data.get('redirect_uri', DEFAULT_REDIRECT_URI),
+    )
+    _expect(isinstance(account.redirect_uri, str) and account.redirect_uri.startswith(('http://', 'https://')),
+            f"'redirect_uri' of account '{name}' must be an http(s) URL")
+    for key in ('token_file', 'orders_file', 'history_file'):
+        _expect(isinstance(getattr(account, key), str) and getattr(account, key), f"'{key}' of account '{name}' must be a path")
+    return account
+
+
+def parse_rate_limits(data):
+    """Validate {"host": {"rate": requests_per_second, "burst": size}}"""
+    if data is None:
+        return {}
+    _expect(isinstance(data, dict), "'rate_limits' must be an object")
+    rate_limits = {}
+    for host, limit in data.items():
+        _expect(isinstance(limit, dict), f"Rate limit of '{host}' must be an object")
+        _known_keys(limit, RATE_LIMIT_KEYS, f"rate limit of '{host}'")
+        rate, burst = limit.get('rate'), limit.get('burst', 1)
+        _expect(isinstance(rate, (int, float)) and not isinstance(rate, bool) and rate > 0,
+                f"'rate' of '{host}' must be a number > 0")
+        _expect(isinstance(burst, int) and not isinstance(burst, bool) and burst >= 1,
+                f"'burst' of '{host}' must be an integer >= 1")
+        rate_limits[host] = (float(rate), burst)
+    return rate_limits
+
+
+def parse_retention(data):
+    """Validate the history compaction and purge settings"""
+    if data is None:
+        return RetentionConfig()
+    _expect(isinstance(data, dict), "'retention' must be an object")
+    _known_keys(data, RETENTION_KEYS, 'retention')
+    return RetentionConfig(
+        full_history_days=_positive_int(data, 'full_history_days', DEFAULT_FULL_HISTORY_DAYS),
+        purge_after_days=_positive_int(data, 'purge_after_days', DEFAULT_PURGE_AFTER_DAYS, 0),
+        interval_hours=_positive_int(data, 'interval_hours', DEFAULT_RETENTION_INTERVAL_HOURS),
+    )
+
+
+def parse_telegram_config(data):
+    """Validate Telegram settings, returns None if the sink is not set up"""
+    if not data:
+        return None
+    _expect(isinstance(data, dict), "Telegram configuration must be an object")
+    _known_keys(data, TELEGRAM_KEYS, 'the Telegram configuration')
+    if not data.get('bot_token') or not data.get('chat_id'):
+        return None
+
+    heartbeat_hours = data.get('heartbeat_hours', DEFAULT_HEARTBEAT_HOURS)
+    _expect(isinstance(heartbeat_hours, (int, float)) and not isinstance(heartbeat_hours, bool) and heartbeat_hours >= 0,
+            "'heartbeat_hours' must be a number >= 0")
+    return TelegramConfig(
+        bot_token=str(data['bot_token']),
+        chat_id=str(data['chat_id']),
+        enabled=bool(data.get('enabled', True)),
+        always_notify=bool(data.get('always_notify', False)),
+        heartbeat_hours=heartbeat_hours,
+    )
+
+
+def parse_config(data, telegram_data=None):
+    """Validate the raw configuration and build an AppConfig"""
+    data = data or {}
+    _expect(isinstance(data, dict), "Configuration must be an object")
+    _known_keys(data, CONFIG_KEYS, 'the configuration')
+
+    default_locale = parse_locale(data.get('locale'))
+    accounts_data = data.get('accounts', [{}])
+    _expect(isinstance(accounts_data, list) and accounts_data, "'accounts' must be a non-empty list")
+    accounts = tuple(parse_account(account, default_locale) for account in accounts_data)
+    names = [account.name for account in accounts]
+    _expect(len(names) == len(set(names)), "Account names must be unique")
+
+    app_version = data.get('app_version', DEFAULT_APP_VERSION)
+    _expect(isinstance(app_version, str) and app_version, "'app_version' must be a string")
+
+    return AppConfig(
+        accounts=accounts,
+        poll_interval=_positive_int(data, 'poll_interval', DEFAULT_POLL_INTERVAL, MIN_POLL_INTERVAL),
+        max_concurrency=_positive_int(data, 'max_concurrency', DEFAULT_MAX_CONCURRENCY),
+        order_details_ttl=_positive_int(data, 'order_details_ttl', DEFAULT_ORDER_DETAILS_TTL, 0),
+        app_version=app_version,
+        rate_limits=parse_rate_limits(data.get('rate_limits')),
+        retention=parse_retention(data.get('retention')),
+        telegram_config_file=telegram_config_path(data),
+        telegram=parse_telegram_config(telegram_data),
+    )
+
+
+def telegram_config_path(data):
+    """Path of the Telegram sink configuration"""
+    data = data or {}
+    _expect(isinstance(data, dict), "Configuration must be an object")
+    sinks = data.get('sinks', {})
+    _expect(isinstance(sinks, dict), "'sinks' must be an object")
+    _known_keys(sinks, SINKS_KEYS, 'sinks')
+    telegram_sink = sinks.get('telegram', {})
+    _expect(isinstance(telegram_sink, dict), "'sinks.telegram' must be an object")
+    _known_keys(telegram_sink, TELEGRAM_SINK_KEYS, 'sinks.telegram')
+    config_file = telegram_sink.get('config_file', TELEGRAM_CONFIG_FILE)
+    _expect(isinstance(config_file, str) and config_file, "'sinks.telegram.config_file' must be a path")
+    return config_file
+
+
+def load_telegram_config(path=TELEGRAM_CONFIG_FILE):
+    """Load Telegram configuration from file, returns None if missing or incomplete"""
+    return parse_telegram_config(read_json_file(path))
+
+
+def save_telegram_config(telegram, path=TELEGRAM_CONFIG_FILE):
+    """Save Telegram configuration to file"""
+    with open(path, 'w') as f:
+        json.dump(asdict(telegram), f, indent=2)
+
+
+_cache = {}
+
+
+def load_config(path=CONFIG_FILE):
+    """Load and validate the configuration, reusing the parsed result while the files are unchanged"""
+    raw = read_json_file(path)
+    telegram_path = telegram_config_path(raw)
+    stamp = (file_stamp(path), file_stamp(telegram_path))
+
+    cached = _cache.get(path)
+    if cached and cached[0] == stamp:
+        return cached[1]
+
+    config = parse_config(raw, read_json_file(telegram_path))
+    _cache[path] = (stamp, config)
+    return config
+
+
+def with_telegram(config, telegram):
+    """Copy of the configuration with other Telegram settings"""
+    return replace(config, telegram=telegram)
+
+
+class ConfigWatcher:
+    """Polls the configuration files for changes and reloads them.
+
+    An invalid file keeps the last good configuration active.
+    """
+
+    def __init__(self, path=CONFIG_FILE):
+        self.path = path
+        self.config = load_config(path)
+        self._stamp = self._current_stamp()
+
+    def _current_stamp(self):
+        return (file_stamp(self.path), file_stamp(self.config.telegram_config_file))
+
+    def poll(self):
+        """Return the new configuration if the files changed, otherwise None"""
+        stamp = self._current_stamp()
+        if stamp == self._stamp:
+            return None
+        self._stamp = stamp
+        try:
+            config = load_config(self.path)
+        except ConfigError as e:
+            print(f"❌ Keeping previous configuration: {e}")
+            return None
+        if config == self.config:
+            return None
+        self.config = config
+        return config
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Snapshot Benchmark
+Compares loading the former single JSON snapshot with the per-order SQLite
+snapshot store, for a growing number of orders. Every measurement runs in a
+fresh process so the reported peak RSS belongs to that load only.
+
+Usage:
+    python3 benchmark_snapshot.py [--counts 100,1000,10000] [--due 10]
+"""
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+from snapshot_store import SnapshotStore
+
+
+def make_order(i):
+    """A synthetic detailed order of roughly the size the Tesla API returns"""
+    reference_number = f"RN{i:09d}"
+    return {
+        'order': {
+            'referenceNumber': reference_number,
+            'orderStatus': 'BOOKED',
+            'modelCode': 'my',
+            'countryCode': 'DE',
+            'vin': None,
+        },
+        'details': {
+            'tasks': {
+                name: {
+                    'complete': False,
+                    'enabled': True,
+                    'title': f"{name} title for {reference_number}",
+                    'data': {f"field{k}": f"value {k} of {reference_number}" for k in range(12)},
+                }
+                for name in ('registration', 'scheduling', 'finalPayment', 'tradeIn', 'deliveryDetails', 'insurance')
+            },
+        },
+    }
+
+
+def generate(count, json_path, store_path):
+    """Runs in a child process: write both snapshot layouts for count orders"""
+    orders = [make_order(i) for i in range(count)]
+    with open(json_path, 'w') as f:
+        json.dump(orders, f)
+    store = SnapshotStore(store_path)
+    store.save(orders)
+    store.close()
+
+
+def measure(mode, path, due):
+    """Runs in a child process: load the snapshot and report time and memory"""
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    if mode == 'json':
+        with open(path, 'r') as f:
+            orders = json.load(f)
+        loaded = len(orders)
+    elif mode == 'store-all':
+        store = SnapshotStore(path)
+        orders = store.load_all()
+        loaded = len(orders)
+    else:
+        store = SnapshotStore(path)
+        references = list(store.positions())[:due]
+        orders = [store.load(reference_number) for reference_number in references]
+        loaded = len(orders)
+    elapsed = time.perf_counter() - start
+    rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in KiB on Linux and bytes on macOS
+    scale = 1024 if sys.platform == 'darwin' else 1
+    print(json.dumps({'seconds': elapsed, 'rss_kib': (rss_after - rss_before) // scale, 'loaded': loaded}))
+
+
+def run_child(*args):
+    # The parent stays small: peak RSS is inherited by child processes on Linux
+    output = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), '--child'] + [str(arg) for arg in args],
+        check=True, capture_output=True, text=True,
+    ).stdout
+    return json.loads(output) if output else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark snapshot load time and memory')
+    parser.add_argument('--counts', default='100,1000,5000,20000', help='Comma separated order counts')
+    parser.add_argument('--due', type=int, default=10, help='Orders due for polling in a cycle')
+    parser.add_argument('--child', nargs='+', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        if args.child[0] == 'generate':
+            generate(int(args.child[1]), args.child[2], args.child[3])
+        else:
+            measure(args.child[0], args.child[1], args.due)
+        return
+
+    print(f"{'orders':>8} {'mode':<18} {'loaded':>8} {'time ms':>10} {'RSS KiB':>10} {'file KiB':>10}")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for count in (int(c) for c in args.counts.split(',')):
+            json_path = os.path.join(tmp_dir, f"orders_{count}.json")
+            store_path = os.path.join(tmp_dir, f"orders_{count}.db")
+            run_child('generate', count, json_path, store_path)
+
+            for mode, path in (('json', json_path), ('store-all', store_path), ('store-due', store_path)):
+                result = run_child(mode, path, '--due', args.due)
+                label = f"store-due ({args.due})" if mode == 'store-due' else mode
+                print(f"{count:>8} {label:<18} {result['loaded']:>8} {result['seconds'] * 1000:>10.1f} "
+                      f"{result['rss_kib']:>10} {os.path.getsize(path) // 1024:>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,30 +4,32 @@ Telegram Configuration Manager
 Easily modify your Telegram notification settings
 """
 
-import json
-import os
+from dataclasses import replace
 
-TELEGRAM_CONFIG_FILE = 'telegram_config.json'
+from app_config import CONFIG_FILE, ConfigError, load_telegram_config, read_json_file, save_telegram_config, telegram_config_path
+
+def config_file_path():
+    """Telegram configuration file named in tesla_config.json"""
+    return telegram_config_path(read_json_file(CONFIG_FILE))
 
 def load_config():
     """Load current configuration"""
-    if not os.path.exists(TELEGRAM_CONFIG_FILE):
-        print("❌ No telegram_config.json found. Run the main script first to set up Telegram.")
-        return None
-    
     try:
-        with open(TELEGRAM_CONFIG_FILE, 'r') as f:
-            return json.load(f)
-    except json.JSONDecodeError:
-        print("❌ Invalid JSON in telegram_config.json")
+        config = load_telegram_config(config_file_path())
+    except ConfigError as e:
+        print(f"❌ {e}")
         return None
 
+    if not config:
+        print("❌ No Telegram configuration found. Run the main script first to set up Telegram.")
+    return config
+
 def save_config(config):
     """Save configuration to file"""
     try:
-        with open(TELEGRAM_CONFIG_FILE, 'w') as f:
-            json.dump(config, f, indent=2)
-        print(f"✅ Configuration saved to {TELEGRAM_CONFIG_FILE}")
+        config_file = config_file_path()
+        save_telegram_config(config, config_file)
+        print(f"✅ Configuration saved to {config_file}")
         return True
     except Exception as e:
         print(f"❌ Error saving configuration: {e}")
@@ -36,10 +38,11 @@ def save_config(config):
 def show_current_config(config):
     """Display current configuration"""
     print("\n📋 Current Telegram Configuration:")
-    print(f"   Bot Token: {config.get('bot_token', 'Not set')[:20]}...")
-    print(f"   Chat ID: {config.get('chat_id', 'Not set')}")
-    print(f"   Enabled: {config.get('enabled', True)}")
-    print(f"   Always Notify: {config.get('always_notify', False)}")
+    print(f"   Bot Token: {config.bot_token[:20]}...")
+    print(f"   Chat ID: {config.chat_id}")
+    print(f"   Enabled: {config.enabled}")
+    print(f"   Always Notify: {config.always_notify}")
+    print(f"   Heartbeat: every {config.heartbeat_hours}h")
 
 def main():
     """Main configuration menu"""
@@ -61,16 +64,14 @@ def main():
         choice = input("\nEnter your choice (1-5): ").strip()
         
         if choice == '1':
-            current = config.get('enabled', True)
-            new_value = not current
-            config['enabled'] = new_value
+            new_value = not config.enabled
+            config = replace(config, enabled=new_value)
             status = "enabled" if new_value else "disabled"
             print(f"✅ Notifications {status}")
             
         elif choice == '2':
-            current = config.get('always_notify', False)
-            new_value = not current
-            config['always_notify'] = new_value
+            new_value = not config.always_notify
+            config = replace(config, always_notify=new_value)
             if new_value:
                 print("✅ Will now send notifications every time (even when no changes)")
             else:
@@ -79,7 +80,7 @@ def main():
         elif choice == '3':
             new_token = input("Enter new bot token: ").strip()
             if new_token:
-                config['bot_token'] = new_token
+                config = replace(config, bot_token=new_token)
                 print("✅ Bot token updated")
             else:
                 print("❌ Invalid token")
@@ -87,7 +88,7 @@ def main():
         elif choice == '4':
             new_chat_id = input("Enter new chat ID: ").strip()
             if new_chat_id:
-                config['chat_id'] = new_chat_id
+                config = replace(config, chat_id=new_chat_id)
                 print("✅ Chat ID updated")
             else:
                 print("❌ Invalid chat ID")
@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""
+Delivery ETA Analytics
+Aggregates how long orders take from BOOKED to VIN assignment to delivery,
+grouped by model code, country and delivery center, based on the history
+recorded by tesla_order_status.py for every configured account
+"""
+
+import argparse
+import csv
+from datetime import datetime
+
+import numpy as np
+
+from app_config import CONFIG_FILE, ConfigError, load_config
+from order_history import iter_history
+from tesla_stores import TeslaStore
+
+STATUS_BOOKED = 'BOOKED'
+STATUS_DELIVERED = 'DELIVERED'
+STAGES = (
+    ('booked_to_vin', 'booked', 'vin'),
+    ('vin_to_delivery', 'vin', 'delivered'),
+    ('booked_to_delivery', 'booked', 'delivered'),
+)
+GROUP_KEYS = ('model', 'country', 'center')
+PERCENTILES = (10, 25, 50, 75, 90)
+SECONDS_PER_DAY = 86400.0
+
+
+def parse_timestamp(value):
+    """Parse an ISO date from the Tesla API into a unix timestamp"""
+    if not value:
+        return None
+    try:
+        return int(datetime.fromisoformat(str(value).replace('Z', '+00:00')).timestamp())
+    except ValueError:
+        return None
+
+
+def load_history_table(history_files):
+    """Load the history files into column arrays, an order watched by several accounts counts once"""
+    refs, ts, statuses, has_vin, booked = [], [], [], [], []
+    models, countries, centers = [], [], []
+
+    seen = set()
+    for history_file in dict.fromkeys(history_files):
+        file_refs = set()
+        for record in iter_history(history_file):
+            ref = record.get('referenceNumber') or ''
+            if ref in seen:
+                # Already loaded from the history of another account
+                continue
+            file_refs.add(ref)
+            refs.append(ref)
+            ts.append(record.get('ts', 0))
+            statuses.append(record.get('orderStatus') or '')
+            has_vin.append(bool(record.get('vin')))
+            booked_ts = parse_timestamp(record.get('orderBookedDate'))
+            booked.append(-1 if booked_ts is None else booked_ts)
+            models.append(record.get('modelCode') or '')
+            countries.append(record.get('countryCode') or '')
+            centers.append(record.get('vehicleRoutingLocation') or 0)
+        seen |= file_refs
+
+    return {
+        'ref': np.array(refs, dtype=object),
+        'ts': np.array(ts, dtype=np.int64),
+        'status': np.array(statuses, dtype=object),
+        'has_vin': np.array(has_vin, dtype=bool),
+        'booked': np.array(booked, dtype=np.int64),
+        'model': np.array(models, dtype=object),
+        'country': np.array(countries, dtype=object),
+        'center': np.array(centers, dtype=np.int64),
+    }
+
+
+def _first_ts(order_idx, ts, mask, order_count):
+    """Earliest timestamp per order among the rows where mask is set, NaN if none"""
+    result = np.full(order_count, np.inf)
+    np.minimum.at(result, order_idx[mask], ts[mask].astype(np.float64))
+    result[np.isinf(result)] = np.nan
+    return result
+
+
+def _observed(order_idx, ts, mask, order_count):
+    """Time a milestone was first seen, NaN unless an earlier sample without it exists.
+
+    Orders tracked only from after the milestone (censored) tell nothing about when it happened.
+    """
+    first_sample = _first_ts(order_idx, ts, np.ones(len(ts), dtype=bool), order_count)
+    first_seen = _first_ts(order_idx, ts, mask, order_count)
+    return np.where(first_seen > first_sample, first_seen, np.nan)
+
+
+def _last_value(order_idx, values, mask, order_count, default):
+    """Most recent value per order among the rows where mask is set (rows sorted by time)"""
+    last_row = np.full(order_count, -1, dtype=np.int64)
+    rows = np.arange(len(order_idx))
+    np.maximum.at(last_row, order_idx[mask], rows[mask])
+    result = np.full(order_count, default, dtype=values.dtype)
+    found = last_row >= 0
+    result[found] = values[last_row[found]]
+    return result
+
+
+def compute_milestones(table):
+    """Reduce the history table to one row of milestone timestamps per order"""
+    order_refs, order_idx = np.unique(table['ref'], return_inverse=True)
+    order_count = len(order_refs)
+
+    # Sort rows by time so "last value" lookups follow the recorded order
+    by_time = np.argsort(table['ts'], kind='stable')
+    order_idx = order_idx[by_time]
+    columns = {name: column[by_time] for name, column in table.items()}
+    ts = columns['ts']
+
+    # Prefer the booking date reported by Tesla, fall back to an observed switch to BOOKED
+    booked = _first_ts(order_idx, columns['booked'], columns['booked'] >= 0, order_count)
+    booked_sample = _observed(order_idx, ts, columns['status'] == STATUS_BOOKED, order_count)
+    booked = np.where(np.isnan(booked), booked_sample, booked)
+
+    return {
+        'ref': order_refs,
+        'booked': booked,
+        'vin': _observed(order_idx, ts, columns['has_vin'], order_count),
+        'delivered': _observed(order_idx, ts, columns['status'] == STATUS_DELIVERED, order_count),
+        'model': _last_value(order_idx, columns['model'], columns['model'] != '', order_count, ''),
+        'country': _last_value(order_idx, columns['country'], columns['country'] != '', order_count, ''),
+        'center': _last_value(order_idx, columns['center'], columns['center'] != 0, order_count, 0),
+    }
+
+
+def aggregate(milestones, group_by=GROUP_KEYS):
+    """Compute duration percentiles in days per group and stage"""
+    order_count = len(milestones['ref'])
+    if order_count == 0:
+        return []
+
+    keys = list(zip(*(milestones[key].tolist() for key in group_by))) if group_by else [()] * order_count
+    unique_keys = sorted(set(keys), key=lambda k: tuple(str(v) for v in k))
+    key_index = {key: i for i, key in enumerate(unique_keys)}
+    group_idx = np.fromiter((key_index[key] for key in keys), dtype=np.int64, count=order_count)
+
+    rows = []
+    for stage, start, end in STAGES:
+        durations = (milestones[end] - milestones[start]) / SECONDS_PER_DAY
+        valid = ~np.isnan(durations) & (durations >= 0)
+        for i, key in enumerate(unique_keys):
+            values = durations[valid & (group_idx == i)]
+            if len(values) == 0:
+                continue
+            row = dict(zip(group_by, key))
+            if 'center' in row:
+                row['center_name'] = TeslaStore(row['center']).label
+            row['stage'] = stage
+            row['orders'] = int(len(values))
+            row['mean_days'] = round(float(values.mean()), 2)
+            for p, value in zip(PERCENTILES, np.percentile(values, PERCENTILES)):
+                row[f'p{p}_days'] = round(float(value), 2)
+            rows.append(row)
+    return rows
+
+
+def export_csv(rows, output_file, group_by=GROUP_KEYS):
+    """Write aggregated rows to a CSV file"""
+    fieldnames = list(group_by)
+    if 'center' in group_by:
+        fieldnames.append('center_name')
+    fieldnames += ['stage', 'orders', 'mean_days'] + [f'p{p}_days' for p in PERCENTILES]
+
+    with open(output_file, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=fieldnames)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Delivery timing percentiles from recorded order history')
+    parser.add_argument('--config', default=CONFIG_FILE, help='Path of the configuration file')
+    parser.add_argument('--history-file', help='Analyse only this history file instead of the configured accounts')
+    parser.add_argument('--output', default='tesla_delivery_eta.csv', help='CSV file to write')
+    parser.add_argument('--by', default=','.join(GROUP_KEYS),
+                        help=f"Comma separated grouping keys out of: {', '.join(GROUP_KEYS)}")
+    args = parser.parse_args()
+
+    group_by = tuple(key for key in args.by.split(',') if key)
+    unknown = [key for key in group_by if key not in GROUP_KEYS]
+    if unknown:
+        parser.error(f"Unknown grouping key(s): {', '.join(unknown)}")
+
+    if args.history_file:
+        history_files = [args.history_file]
+    else:
+        try:
+            history_files = [account.history_file for account in load_config(args.config).accounts]
+        except ConfigError as e:
+            print(f"❌ {e}")
+            exit(1)
+
+    table = load_history_table(history_files)
+    if len(table['ref']) == 0:
+        print(f"❌ No history found in {', '.join(history_files)}. Run tesla_order_status.py first.")
+        return
+
+    milestones = compute_milestones(table)
+    rows = aggregate(milestones, group_by)
+    export_csv(rows, args.output, group_by)
+
+    print(f"📊 Analysed {len(table['ref'])} samples of {len(milestones['ref'])} orders")
+    for row in rows:
+        group = ' / '.join(str(row.get('center_name', row[key]) if key == 'center' else row[key]) for key in group_by)
+        print(f"   {group or 'all'} {row['stage']}: median {row['p50_days']} days, p90 {row['p90_days']} days ({row['orders']} orders)")
+    print(f"✅ Percentiles written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""
+Local Order Read API
+Serves the cached order state as JSON so dashboards never hit the Tesla API.
+The state is kept in memory and reloaded only when the poller writes new files.
+Every account of the configuration is served from its own files.
+
+Endpoints:
+    GET /accounts                    names of the configured accounts
+    GET /orders                      current order summaries
+    GET /orders/<reference>          summary and full details of one order
+    GET /orders/<reference>/history  recorded history of one order
+    GET /stores                      all known delivery locations
+    GET /stores/<id>                 one delivery location
+
+The order endpoints serve the default account (or the first one), the same
+endpoints below /accounts/<name>, e.g. /accounts/<name>/orders, serve any
+account.
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import threading
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from app_config import CONFIG_FILE, DEFAULT_ACCOUNT, AccountConfig, ConfigError, file_stamp, load_config
+from order_history import load_history, project_order
+from snapshot_store import SnapshotStore, store_file
+from tesla_stores import TeslaStore
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8080
+
+
+def store_to_dict(store):
+    """Serialize a TeslaStore entry"""
+    return {'id': int(store), 'code': store.name, 'label': store.label}
+
+
+@lru_cache(maxsize=None)
+def store_responses():
+    """Encoded store metadata, it never changes while running"""
+    responses = {
+        '/stores': json.dumps([store_to_dict(s) for s in TeslaStore if s is not TeslaStore.NA]).encode('utf-8'),
+    }
+    for store in TeslaStore:
+        responses[f'/stores/{int(store)}'] = json.dumps(store_to_dict(store)).encode('utf-8')
+    return responses
+
+
+class OrderStateCache:
+    """In-memory order state, invalidated when the snapshot or history file changes"""
+
+    def __init__(self, orders_file=AccountConfig.orders_file, history_file=AccountConfig.history_file):
+        self.orders_file = store_file(orders_file)
+        self.history_file = history_file
+        self._lock = threading.Lock()
+        self._stamp = None
+        self._responses = {}
+        self._stores = store_responses()
+
+    def _current_stamp(self):
+        return (file_stamp(self.orders_file), file_stamp(self.history_file))
+
+    def _load_orders(self):
+        if not os.path.exists(self.orders_file):
+            return []
+        store = SnapshotStore(self.orders_file)
+        try:
+            return store.load_all()
+        finally:
+            store.close()
+
+    def _rebuild(self, stamp):
+        detailed_orders = self._load_orders()
+        history = load_history(history_file=self.history_file)
+        updated_at = stamp[0][0] // 1_000_000_000 if stamp[0] else None
+
+        summaries = [project_order(detailed_order) for detailed_order in detailed_orders]
+        responses = {
+            '/orders': {'updated_at': updated_at, 'orders': summaries},
+        }
+        for summary, detailed_order in zip(summaries, detailed_orders):
+            ref = summary['referenceNumber']
+            responses[f'/orders/{ref}'] = {'order': summary, 'details': detailed_order}
+            responses[f'/orders/{ref}/history'] = {'referenceNumber': ref, 'history': history.get(ref, [])}
+        # Orders that are no longer returned by Tesla still have their history
+        for ref, records in history.items():
+            responses.setdefault(f'/orders/{ref}/history', {'referenceNumber': ref, 'history': records})
+
+        self._responses = {path: json.dumps(body).encode('utf-8') for path, body in responses.items()}
+        self._stamp = stamp
+
+    def get(self, path):
+        """Return the encoded JSON body for a path, or None if unknown"""
+        if path in self._stores:
+            return self._stores[path]
+
+        stamp = self._current_stamp()
+        if stamp != self._stamp:
+            with self._lock:
+                if stamp != self._stamp:
+                    try:
+                        self._rebuild(stamp)
+                    except sqlite3.OperationalError:
+                        # The poller or retention is writing, serve the previous state until the next request
+                        if self._stamp is None:
+                            raise
+        return self._responses.get(path)
+
+
+class AccountRouter:
+    """Routes requests to the order state of the requested account"""
+
+    def __init__(self, accounts):
+        self.caches = {account.name: OrderStateCache(account.orders_file, account.history_file) for account in accounts}
+        self.default = DEFAULT_ACCOUNT if DEFAULT_ACCOUNT in self.caches else accounts[0].name
+        self._accounts = json.dumps({'default': self.default, 'accounts': list(self.caches)}).encode('utf-8')
+
+    def get(self, path):
+        """Return the encoded JSON body for a path, or None if unknown"""
+        if path == '/accounts':
+            return self._accounts
+        if path.startswith('/accounts/'):
+            name, _, rest = path[len('/accounts/'):].partition('/')
+            cache = self.caches.get(name)
+            if cache is None or not rest:
+                return None
+            return cache.get(f'/{rest}')
+        return self.caches[self.default].get(path)
+
+
+class OrderAPIHandler(BaseHTTPRequestHandler):
+    router = None
+
+    def do_GET(self):
+        path = self.path.split('?', 1)[0].rstrip('/') or '/'
+        try:
+            body = self.router.get(path)
+        except sqlite3.OperationalError as e:
+            # Nothing loaded yet and the snapshot is locked by a writer
+            self._send(503, json.dumps({'error': f'Order state unavailable: {e}'}).encode('utf-8'), {'Retry-After': '1'})
+            return
+        if body is None:
+            self._send(404, json.dumps({'error': f'Not found: {path}'}).encode('utf-8'))
+        else:
+            self._send(200, body)
+
+    def _send(self, status, body, headers=None):
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Keep the console quiet, dashboards poll frequently
+        pass
+
+
+def serve(host=DEFAULT_HOST, port=DEFAULT_PORT, accounts=(AccountConfig(),)):
+    """Run the read API for the given accounts until interrupted"""
+    router = AccountRouter(accounts)
+    handler = type('Handler', (OrderAPIHandler,), {'router': router})
+    server = ThreadingHTTPServer((host, port), handler)
+    print(f"🌐 Serving order state of {len(router.caches)} account(s) on http://{host}:{port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve cached Tesla order state as JSON')
+    parser.add_argument('--host', default=DEFAULT_HOST)
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--config', default=CONFIG_FILE, help='Path of the configuration file')
+    parser.add_argument('--orders-file', help='Serve only this snapshot file instead of the configured accounts')
+    parser.add_argument('--history-file', default=AccountConfig.history_file, help='History file used with --orders-file')
+    args = parser.parse_args()
+
+    if args.orders_file:
+        accounts = (AccountConfig(orders_file=args.orders_file, history_file=args.history_file),)
+    else:
+        try:
+            accounts = load_config(args.config).accounts
+        except ConfigError as e:
+            print(f"❌ {e}")
+            exit(1)
+    serve(args.host, args.port, accounts)
+
+
+if __name__ == "__main__":
+    main()
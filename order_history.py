@@ -0,0 +1,80 @@
+"""
+Order History
+Keeps a compact projection of every order on each run so other tools
+(read API, analytics) can work without calling the Tesla API
+"""
+
+import json
+import os
+import threading
+import time
+
+HISTORY_FILE = 'tesla_orders_history.jsonl'
+# Held while appending, so retention can swap in a compacted file between runs
+HISTORY_LOCK = threading.Lock()
+
+
+def project_order(detailed_order):
+    """Build a compact summary of a detailed order"""
+    order = detailed_order['order']
+    tasks = detailed_order['details'].get('tasks', {})
+    scheduling = tasks.get('scheduling', {})
+    order_info = tasks.get('registration', {}).get('orderDetails', {})
+    final_payment_data = tasks.get('finalPayment', {}).get('data', {})
+
+    return {
+        'referenceNumber': order['referenceNumber'],
+        'orderStatus': order.get('orderStatus'),
+        'modelCode': order.get('modelCode'),
+        'countryCode': order.get('countryCode'),
+        'vin': order.get('vin'),
+        'vehicleRoutingLocation': order_info.get('vehicleRoutingLocation'),
+        'reservationDate': order_info.get('reservationDate'),
+        'orderBookedDate': order_info.get('orderBookedDate'),
+        'deliveryWindow': scheduling.get('deliveryWindowDisplay'),
+        'deliveryAppointment': scheduling.get('apptDateTimeAddressStr'),
+        'etaToDeliveryCenter': final_payment_data.get('etaToDeliveryCenter'),
+    }
+
+
+def append_history(detailed_orders, timestamp=None, history_file=HISTORY_FILE):
+    """Append one projection per order to the history file"""
+    if timestamp is None:
+        timestamp = int(time.time())
+
+    lines = []
+    for detailed_order in detailed_orders:
+        record = project_order(detailed_order)
+        record['ts'] = timestamp
+        lines.append(json.dumps(record) + '\n')
+
+    with HISTORY_LOCK, open(history_file, 'a') as f:
+        f.writelines(lines)
+
+
+def iter_history(history_file=HISTORY_FILE):
+    """Yield history records in the order they were written"""
+    if not os.path.exists(history_file):
+        return
+
+    with open(history_file, 'r') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                # A partially written last line is skipped, not fatal
+                continue
+
+
+def load_history(reference_number=None, history_file=HISTORY_FILE):
+    """Load history records grouped by order reference number"""
+    history = {}
+    for record in iter_history(history_file):
+        ref = record.get('referenceNumber')
+        if reference_number is not None and ref != reference_number:
+            continue
+        history.setdefault(ref, []).append(record)
+    return history
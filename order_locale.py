@@ -0,0 +1,132 @@
+"""
+Order Locale
+Splits the order details returned by Tesla into locale independent content and
+localized display texts.
+
+The localized texts of every locale are cached against a hash of the locale
+independent content they were fetched with. When the same order is needed in
+another locale and its content has not changed, the details are composed from
+the cache instead of being fetched again. Diffs across a locale change compare the
+new details in the previous locale when its texts were fetched in the same
+poll cycle for the same content. Otherwise the texts are compared as they are,
+so a changed delivery window is never hidden by the switch.
+"""
+
+import copy
+import hashlib
+import json
+import re
+import threading
+import time
+
+# Keys holding texts that Tesla translates to the requested device language
+LOCALIZED_KEY_PATTERN = re.compile(
+    r'(Display|Str|Text|Title|Subtitle|Label|Message|Copy|Description|Header|Footer|Cta)$'
+    r'|^(title|subtitle|label|message|description|header|footer|body|cta|copy|text|disclaimer|strings)$'
+)
+DEFAULT_FRESHNESS = 60
+
+
+def locale_tag(locale):
+    """Short form of a locale, e.g. en_DE"""
+    return f"{locale.language}_{locale.country}"
+
+
+def is_localized_key(key):
+    return bool(LOCALIZED_KEY_PATTERN.search(key))
+
+
+def split_localized(details):
+    """Split details into (locale independent details, {path: localized value})"""
+    localized = {}
+
+    def walk(value, path):
+        if isinstance(value, dict):
+            neutral = {}
+            for key, item in value.items():
+                item_path = path + (key,)
+                if is_localized_key(key) and isinstance(item, (str, list, dict)):
+                    localized[json.dumps(item_path)] = item
+                else:
+                    neutral[key] = walk(item, item_path)
+            return neutral
+        if isinstance(value, list):
+            return [walk(item, path + (i,)) for i, item in enumerate(value)]
+        return value
+
+    return walk(details, ()), localized
+
+
+def merge_localized(neutral, localized):
+    """Inverse of split_localized"""
+    details = copy.deepcopy(neutral)
+    for path, value in localized.items():
+        target = details
+        keys = json.loads(path)
+        for key in keys[:-1]:
+            target = target[key]
+        target[keys[-1]] = value
+    return details
+
+
+def content_hash(value):
+    return hashlib.sha256(json.dumps(value, sort_keys=True, separators=(',', ':')).encode('utf-8')).hexdigest()
+
+
+class LocaleVariants:
+    """Localized texts per order and locale, valid for one version of the locale independent content"""
+
+    def __init__(self, freshness=DEFAULT_FRESHNESS):
+        self.freshness = freshness
+        self._lock = threading.Lock()
+        self._variants = {}
+        self._current = {}
+        self._cycle = 0
+        self.composed = 0
+
+    def record(self, reference_number, tag, details):
+        """Remember freshly fetched details of an order in a locale"""
+        neutral, localized = split_localized(details)
+        neutral_hash = content_hash(neutral)
+        with self._lock:
+            variants = self._variants.setdefault(reference_number, {})
+            previous = variants.get(tag)
+            if previous and previous[0] == neutral_hash and previous[1] != localized:
+                # Only texts changed, the texts cached for other locales in earlier cycles are outdated as well
+                variants = self._variants[reference_number] = {
+                    other: variant for other, variant in variants.items() if variant[2] == self._cycle
+                }
+            variants[tag] = (neutral_hash, localized, self._cycle)
+            self._current[reference_number] = (time.monotonic(), neutral, neutral_hash)
+
+    def expire(self):
+        """Forget the fetched content, keeping the texts of every locale"""
+        with self._lock:
+            self._current.clear()
+            self._cycle += 1
+            self.composed = 0
+
+    def compose(self, reference_number, tag):
+        """Details in the given locale without fetching, if the content was fetched recently in any locale"""
+        with self._lock:
+            current = self._current.get(reference_number)
+            variant = self._variants.get(reference_number, {}).get(tag)
+            if current is None or variant is None:
+                return None
+            fetched_at, neutral, neutral_hash = current
+            if time.monotonic() - fetched_at > self.freshness or variant[0] != neutral_hash:
+                return None
+            self.composed += 1
+        return merge_localized(neutral, variant[1])
+
+    def translate(self, reference_number, details, tag):
+        """The details with the texts of another locale fetched in this cycle for the same content, or None"""
+        neutral = split_localized(details)[0]
+        with self._lock:
+            variant = self._variants.get(reference_number, {}).get(tag)
+            if variant is None or variant[2] != self._cycle:
+                # Older texts may belong to an older version of the content, the hash only covers the rest
+                return None
+        if variant[0] != content_hash(neutral):
+            return None
+        return merge_localized(neutral, variant[1])
@@ -0,0 +1,309 @@
+"""
+Request Scheduler
+Rate limits all requests to the Tesla endpoints with a token bucket per host.
+
+Requests wait in a priority queue per host, so orders nearing delivery are
+fetched first when the limit is reached. A 429 (or 503) response blocks the
+host for the time given in Retry-After, after which the request is retried at
+half the rate, without a burst. The configured rate is restored by configure().
+The scheduler offers get() and post() like a requests session and can be used
+wherever a session is expected. AsyncRequestScheduler does the same for an
+httpx.AsyncClient on the event loop.
+"""
+
+import asyncio
+import heapq
+import itertools
+import threading
+import time
+import urllib.parse
+from email.utils import parsedate_to_datetime
+
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 1
+PRIORITY_LOW = 2
+
+# Requests per second and burst size per host
+DEFAULT_RATE_LIMITS = {
+    'owner-api.teslamotors.com': (0.5, 3),
+    'akamai-apigateway-vfx.tesla.com': (1.0, 4),
+    'auth.tesla.com': (0.2, 2),
+}
+DEFAULT_RATE_LIMIT = (1.0, 4)
+DEFAULT_RETRY_AFTER = 30
+MAX_RETRY_AFTER = 900
+MAX_RETRIES = 3
+MIN_RATE_FACTOR = 1 / 16
+THROTTLE_STATUS_CODES = (429, 503)
+
+
+def parse_retry_after(value, default=DEFAULT_RETRY_AFTER):
+    """Seconds to wait from a Retry-After header (seconds or HTTP date)"""
+    if not value:
+        return default
+    try:
+        seconds = float(value)
+    except ValueError:
+        try:
+            seconds = parsedate_to_datetime(value).timestamp() - time.time()
+        except (TypeError, ValueError):
+            return default
+    return min(max(seconds, 0), MAX_RETRY_AFTER)
+
+
+class TokenBucket:
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        # updated lies in the future while the host is blocked, nothing is refilled until then
+        if now > self.updated:
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+    def delay(self, now):
+        """Seconds until a token is available"""
+        self._refill(now)
+        return 0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self, now):
+        self._refill(now)
+        self.tokens -= 1
+
+
+class HostQueue:
+    """Waiting requests and limits of one host"""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.bucket = TokenBucket(rate, burst)
+        self.condition = threading.Condition()
+        self.waiting = []
+        self.blocked_until = 0
+        self.requests = 0
+        self.throttled = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.max_depth = 0
+
+    def _enqueue(self, entry):
+        heapq.heappush(self.waiting, entry)
+        self.max_depth = max(self.max_depth, len(self.waiting))
+
+    def _turn(self, entry):
+        """0 if the request may be sent now, else the seconds to wait (None: until notified)"""
+        if self.waiting[0] != entry:
+            return None
+        now = time.monotonic()
+        delay = max(self.blocked_until - now, self.bucket.delay(now))
+        if delay > 0:
+            return delay
+        self.bucket.take(now)
+        heapq.heappop(self.waiting)
+        return 0
+
+    def _withdraw(self, entry):
+        """Remove a request that stopped waiting, so the ones behind it get their turn"""
+        if entry in self.waiting:
+            self.waiting.remove(entry)
+            heapq.heapify(self.waiting)
+
+    def _record_wait(self, start):
+        waited = time.monotonic() - start
+        self.requests += 1
+        self.total_wait += waited
+        self.max_wait = max(self.max_wait, waited)
+        return waited
+
+    def _block(self, seconds):
+        now = time.monotonic()
+        self.throttled += 1
+        # Several requests in flight can be rejected at once, slow down only once per block
+        if now >= self.blocked_until:
+            self.bucket.rate = max(self.bucket.rate / 2, self.rate * MIN_RATE_FACTOR)
+        self.bucket.tokens = 0
+        self.bucket.updated = now + seconds
+        self.blocked_until = max(self.blocked_until, now + seconds)
+
+    def _set_limits(self, rate, burst):
+        self.rate = rate
+        self.bucket.rate = rate
+        self.bucket.burst = burst
+
+    def _reset_stats(self):
+        self.requests = self.throttled = self.max_depth = 0
+        self.total_wait = self.max_wait = 0.0
+
+    def acquire(self, priority, sequence):
+        """Block until it is this request's turn, returns the time waited"""
+        start = time.monotonic()
+        entry = (priority, sequence)
+        with self.condition:
+            self._enqueue(entry)
+            try:
+                while True:
+                    delay = self._turn(entry)
+                    if delay == 0:
+                        break
+                    self.condition.wait(delay)
+            except BaseException:
+                self._withdraw(entry)
+                raise
+            finally:
+                # The next request in line may be allowed right away (burst), or now heads the queue
+                self.condition.notify_all()
+            return self._record_wait(start)
+
+    def block(self, seconds):
+        with self.condition:
+            self._block(seconds)
+            self.condition.notify_all()
+
+    def set_limits(self, rate, burst):
+        with self.condition:
+            self._set_limits(rate, burst)
+            self.condition.notify_all()
+
+    def reset_stats(self):
+        with self.condition:
+            self._reset_stats()
+
+    @property
+    def depth(self):
+        return len(self.waiting)
+
+
+class RequestScheduler:
+    host_queue_class = HostQueue
+
+    def __init__(self, session, rate_limits=None, max_retries=MAX_RETRIES):
+        self.session = session
+        self.max_retries = max_retries
+        self._lock = threading.Lock()
+        self._sequence = itertools.count()
+        self._hosts = {}
+        self._limits = dict(DEFAULT_RATE_LIMITS)
+        if rate_limits:
+            self.configure(rate_limits)
+
+    def configure(self, rate_limits):
+        """Apply new limits per host, existing queues and the session are kept"""
+        with self._lock:
+            self._limits = dict(DEFAULT_RATE_LIMITS, **rate_limits)
+            for host, host_queue in self._hosts.items():
+                host_queue.set_limits(*self._limits.get(host, DEFAULT_RATE_LIMIT))
+
+    def _host_queue(self, host):
+        with self._lock:
+            if host not in self._hosts:
+                self._hosts[host] = self.host_queue_class(*self._limits.get(host, DEFAULT_RATE_LIMIT))
+            return self._hosts[host]
+
+    def request(self, method, url, priority=PRIORITY_NORMAL, **kwargs):
+        host_queue = self._host_queue(urllib.parse.urlparse(url).hostname)
+        sequence = next(self._sequence)
+        for attempt in range(self.max_retries + 1):
+            host_queue.acquire(priority, sequence)
+            response = self.session.request(method, url, **kwargs)
+            if response.status_code not in THROTTLE_STATUS_CODES or attempt == self.max_retries:
+                return response
+            if response.status_code == 503 and 'Retry-After' not in response.headers:
+                return response
+            host_queue.block(parse_retry_after(response.headers.get('Retry-After')))
+        return response
+
+    def get(self, url, priority=PRIORITY_NORMAL, **kwargs):
+        return self.request('GET', url, priority, **kwargs)
+
+    def post(self, url, priority=PRIORITY_NORMAL, **kwargs):
+        return self.request('POST', url, priority, **kwargs)
+
+    def stats(self):
+        """Requests, throttling, waiting time and queue depth per host"""
+        with self._lock:
+            hosts = dict(self._hosts)
+        return {
+            host: {
+                'requests': host_queue.requests,
+                'throttled': host_queue.throttled,
+                'queue_depth': host_queue.depth,
+                'max_queue_depth': host_queue.max_depth,
+                'total_wait': host_queue.total_wait,
+                'max_wait': host_queue.max_wait,
+            }
+            for host, host_queue in hosts.items()
+        }
+
+    def reset_stats(self):
+        with self._lock:
+            for host_queue in self._hosts.values():
+                host_queue.reset_stats()
+
+
+class AsyncHostQueue(HostQueue):
+    """HostQueue for coroutines, all waiting happens on the event loop"""
+
+    def __init__(self, rate, burst):
+        super().__init__(rate, burst)
+        self.condition = asyncio.Condition()
+
+    async def acquire(self, priority, sequence):
+        start = time.monotonic()
+        entry = (priority, sequence)
+        async with self.condition:
+            self._enqueue(entry)
+            try:
+                while True:
+                    delay = self._turn(entry)
+                    if delay == 0:
+                        break
+                    try:
+                        await asyncio.wait_for(self.condition.wait(), delay)
+                    except asyncio.TimeoutError:
+                        pass
+            except BaseException:
+                # A cancelled request must not hold up the queue
+                self._withdraw(entry)
+                raise
+            finally:
+                self.condition.notify_all()
+            return self._record_wait(start)
+
+    async def block(self, seconds):
+        async with self.condition:
+            self._block(seconds)
+            self.condition.notify_all()
+
+    # Only called from the event loop thread, waiters pick up new limits after their current delay
+    def set_limits(self, rate, burst):
+        self._set_limits(rate, burst)
+
+    def reset_stats(self):
+        self._reset_stats()
+
+
+class AsyncRequestScheduler(RequestScheduler):
+    """RequestScheduler sending through an httpx.AsyncClient, which can be set once the event loop runs"""
+    host_queue_class = AsyncHostQueue
+
+    async def request(self, method, url, priority=PRIORITY_NORMAL, **kwargs):
+        host_queue = self._host_queue(urllib.parse.urlparse(url).hostname)
+        sequence = next(self._sequence)
+        for attempt in range(self.max_retries + 1):
+            await host_queue.acquire(priority, sequence)
+            response = await self.session.request(method, url, **kwargs)
+            if response.status_code not in THROTTLE_STATUS_CODES or attempt == self.max_retries:
+                return response
+            if response.status_code == 503 and 'Retry-After' not in response.headers:
+                return response
+            await host_queue.block(parse_retry_after(response.headers.get('Retry-After')))
+        return response
+
+    async def get(self, url, priority=PRIORITY_NORMAL, **kwargs):
+        return await self.request('GET', url, priority, **kwargs)
+
+    async def post(self, url, priority=PRIORITY_NORMAL, **kwargs):
+        return await self.request('POST', url, priority, **kwargs)
@@ -0,0 +1,249 @@
+"""
+Retention
+Keeps the recorded order state from growing without bound.
+
+History records older than full_history_days are compacted: every change is
+kept, unchanged records only as one daily checkpoint per order. Delivered and
+cancelled orders whose snapshot did not change for purge_after_days are purged
+from the snapshot and are no longer polled. Their history is compacted right
+away, keeping the changes the delivery analytics are based on. The space is
+reclaimed by rewriting the history file and vacuuming the snapshot database.
+
+Compaction is incremental: the end of the compacted part of the history and
+the last state of every order there are kept in <history file>.compacted, and
+each run only reads the records after it. The history is compacted into a new
+file while the poller keeps appending. Records appended in the meantime are
+copied over under the history lock right before the new file replaces the old
+one.
+
+Usage:
+    python3 retention.py [--config tesla_config.json]
+"""
+
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+from app_config import CONFIG_FILE, ConfigError, load_config
+from order_history import HISTORY_LOCK
+from snapshot_store import SnapshotStore
+
+FINAL_STATUSES = ('DELIVERED', 'CANCELLED')
+SECONDS_PER_DAY = 86400
+SLEEP_STEP = 5
+
+
+def purge_orders(store, purge_after_days, now=None):
+    """Purge final orders unchanged for purge_after_days, returns their reference numbers"""
+    if not purge_after_days:
+        return []
+    if now is None:
+        now = int(time.time())
+
+    expired = []
+    for reference_number, raw in store.unchanged_since(now - purge_after_days * SECONDS_PER_DAY):
+        if json.loads(raw)['order'].get('orderStatus') in FINAL_STATUSES:
+            expired.append(reference_number)
+    if expired:
+        store.purge(expired)
+    return expired
+
+
+def keep_record(record, last_content, last_day):
+    """Changes are kept, unchanged records once per order and day"""
+    reference_number = record.get('referenceNumber')
+    timestamp = record.get('ts', 0)
+    content = {key: value for key, value in record.items() if key != 'ts'}
+    changed = last_content.get(reference_number) != content
+    last_content[reference_number] = content
+
+    day = timestamp // SECONDS_PER_DAY
+    if changed or last_day.get(reference_number) != day:
+        last_day[reference_number] = day
+        return True
+    return False
+
+
+def state_file(history_file):
+    return f"{history_file}.compacted"
+
+
+def load_state(history_file):
+    """End of the compacted part and the order state there, starts over if the history was replaced"""
+    fresh = {'offset': 0, 'inode': None, 'last_content': {}, 'last_day': {}}
+    try:
+        with open(state_file(history_file), 'r') as f:
+            state = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return fresh
+    stat = os.stat(history_file)
+    if state.get('inode') != stat.st_ino or state.get('offset', 0) > stat.st_size:
+        return fresh
+    return state
+
+
+def save_state(history_file, offset, last_content, last_day):
+    state = {
+        'offset': offset,
+        'inode': os.stat(history_file).st_ino,
+        'last_content': last_content,
+        'last_day': last_day,
+    }
+    with open(state_file(history_file), 'w') as f:
+        json.dump(state, f)
+
+
+def _copy_bytes(src, dst, count):
+    while count > 0:
+        chunk = src.read(min(count, 1 << 20))
+        if not chunk:
+            break
+        dst.write(chunk)
+        count -= len(chunk)
+
+
+def compact_history(history_file, full_history_days, purged=(), now=None):
+    """Compact the history past the already compacted part, returns (records read, records kept)"""
+    if not os.path.exists(history_file):
+        return 0, 0
+    if now is None:
+        now = int(time.time())
+    cutoff = now - full_history_days * SECONDS_PER_DAY
+
+    # append_history writes whole runs under the lock, so the end is a line boundary
+    with HISTORY_LOCK:
+        end = os.path.getsize(history_file)
+    state = load_state(history_file)
+    offset = state['offset']
+    last_content, last_day = state['last_content'], state['last_day']
+
+    read = kept = 0
+    recent_start = None
+    with open(history_file, 'rb') as src, tempfile.TemporaryFile(dir=os.path.dirname(os.path.abspath(history_file))) as region:
+        src.seek(offset)
+        while src.tell() < end:
+            line = src.readline()
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            read += 1
+            if recent_start is None and record.get('ts', 0) >= cutoff:
+                # Recent records stay complete and are compacted once they are old enough
+                recent_start = offset + region.tell()
+                recent_content, recent_day = dict(last_content), dict(last_day)
+
+            if recent_start is None:
+                keep = keep_record(record, last_content, last_day)
+            elif record.get('referenceNumber') in purged:
+                # Purged orders are no longer polled, only their changes and daily checkpoints are kept
+                keep = keep_record(record, recent_content, recent_day)
+            else:
+                keep = True
+            if keep:
+                region.write(line)
+                kept += 1
+        if recent_start is None:
+            recent_start = offset + region.tell()
+
+        if region.tell() == end - offset:
+            # Nothing dropped, the file stays as it is
+            save_state(history_file, recent_start, last_content, last_day)
+            return read, kept
+
+        compacted_file = f"{history_file}.compact"
+        with open(compacted_file, 'wb') as dst:
+            src.seek(0)
+            _copy_bytes(src, dst, offset)
+            region.seek(0)
+            shutil.copyfileobj(region, dst)
+            with HISTORY_LOCK:
+                # Records appended since the compaction started
+                src.seek(end)
+                shutil.copyfileobj(src, dst)
+                dst.flush()
+                os.fsync(dst.fileno())
+                os.replace(compacted_file, history_file)
+    save_state(history_file, recent_start, last_content, last_day)
+    return read, kept
+
+
+def collect(account, retention, now=None):
+    """Apply the retention policy to one account, returns what was removed"""
+    history_size = os.path.getsize(account.history_file) if os.path.exists(account.history_file) else 0
+
+    store = SnapshotStore(account.orders_file)
+    try:
+        purged = purge_orders(store, retention.purge_after_days, now)
+        if purged:
+            store.vacuum()
+        read, kept = compact_history(account.history_file, retention.full_history_days, store.purged(), now)
+    finally:
+        store.close()
+
+    new_size = os.path.getsize(account.history_file) if os.path.exists(account.history_file) else 0
+    return {
+        'purged_orders': purged,
+        'history_records': read,
+        'removed_records': read - kept,
+        'reclaimed_bytes': max(history_size - new_size, 0),
+    }
+
+
+def report(account, stats):
+    if stats['purged_orders']:
+        print(f"🧹 {account.name}: purged {len(stats['purged_orders'])} delivered or cancelled orders "
+              f"({', '.join(stats['purged_orders'])})")
+    if stats['removed_records']:
+        print(f"🧹 {account.name}: compacted {stats['history_records']} history records to "
+              f"{stats['history_records'] - stats['removed_records']}, "
+              f"{stats['reclaimed_bytes'] / 1024:.0f} KiB reclaimed")
+
+
+class RetentionWorker(threading.Thread):
+    """Applies the retention policy every interval_hours next to the poller in daemon mode"""
+
+    def __init__(self, get_config):
+        super().__init__(name='retention', daemon=True)
+        self.get_config = get_config
+
+    def run(self):
+        while True:
+            config = self.get_config()
+            for account in config.accounts:
+                try:
+                    report(account, collect(account, config.retention))
+                except Exception as e:
+                    # A busy database or a malformed record is retried on the next run, the other accounts go on
+                    print(f"❌ Retention for '{account.name}' failed: {e}")
+
+            # Sleep in steps, so a reloaded interval_hours applies to the current wait
+            last_run = time.monotonic()
+            while time.monotonic() < last_run + self.get_config().retention.interval_hours * 3600:
+                time.sleep(SLEEP_STEP)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compact the order history and purge finished orders')
+    parser.add_argument('--config', default=CONFIG_FILE, help='Path of the configuration file')
+    args = parser.parse_args()
+
+    try:
+        config = load_config(args.config)
+    except ConfigError as e:
+        print(f"❌ {e}")
+        exit(1)
+
+    for account in config.accounts:
+        stats = collect(account, config.retention)
+        report(account, stats)
+        if not stats['purged_orders'] and not stats['removed_records']:
+            print(f"✅ {account.name}: nothing to clean up")
+
+
+if __name__ == "__main__":
+    main()
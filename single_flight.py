@@ -0,0 +1,81 @@
+"""
+Single Flight
+Deduplicates concurrent calls for the same key: the first caller performs the
+call, callers arriving while it is in flight wait for and share its result.
+Results are kept for a short TTL so later callers in the same poll cycle reuse
+them too. If the caller making the call is cancelled, the waiting callers are
+not: one of them makes the call again. All callers run as coroutines on one
+event loop.
+"""
+
+import asyncio
+import time
+
+DEFAULT_TTL = 60
+
+
+class AsyncSingleFlight:
+    def __init__(self, ttl=DEFAULT_TTL):
+        self.ttl = ttl
+        self._in_flight = {}
+        self._cache = {}
+        self.upstream_calls = 0
+        self.shared_calls = 0
+        self.cache_hits = 0
+
+    @property
+    def saved_calls(self):
+        """Number of upstream calls avoided"""
+        return self.shared_calls + self.cache_hits
+
+    async def do(self, key, fn, *args, **kwargs):
+        """Return await fn(*args, **kwargs), sharing the call with other callers of the same key"""
+        # Nothing is awaited until the call is registered, so no lock is needed on the event loop
+        cached = self._cache.get(key)
+        if cached is not None and cached[0] > time.monotonic():
+            self.cache_hits += 1
+            return cached[1]
+
+        call = self._in_flight.get(key)
+        if call is not None:
+            self.shared_calls += 1
+            try:
+                # A cancelled waiter must not cancel the call of the others
+                return await asyncio.shield(call)
+            except asyncio.CancelledError:
+                if not call.cancelled():
+                    raise
+            # The caller making the call was cancelled, not this one, so the call is made again
+            self.shared_calls -= 1
+            return await self.do(key, fn, *args, **kwargs)
+
+        call = self._in_flight[key] = asyncio.get_running_loop().create_future()
+        self.upstream_calls += 1
+        try:
+            result = await fn(*args, **kwargs)
+        except asyncio.CancelledError:
+            # Waiters see the cancelled call and retry it themselves
+            call.cancel()
+            raise
+        except Exception as e:
+            # Errors are shared with the waiting callers but never cached
+            call.set_exception(e)
+            call.exception()  # retrieved here, also when nobody is waiting
+            raise
+        else:
+            self._cache[key] = (time.monotonic() + self.ttl, result)
+            call.set_result(result)
+            return result
+        finally:
+            del self._in_flight[key]
+
+    def clear(self):
+        self._cache.clear()
+
+    def stats(self):
+        return {
+            'upstream_calls': self.upstream_calls,
+            'shared_calls': self.shared_calls,
+            'cache_hits': self.cache_hits,
+            'saved_calls': self.saved_calls,
+        }
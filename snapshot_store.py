@@ -0,0 +1,171 @@
+"""
+Snapshot Store
+The last known state of every order, stored as one SQLite row per order.
+
+Orders are only decoded when they are needed: unchanged orders are detected by
+comparing their serialized JSON text, so they are never parsed at all.
+A snapshot from the former single JSON file is imported on first use.
+Orders purged by retention are remembered, so they are not polled again.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS orders (
+    reference_number TEXT PRIMARY KEY,
+    position INTEGER NOT NULL,
+    data TEXT NOT NULL,
+    updated_at INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS purged (
+    reference_number TEXT PRIMARY KEY,
+    purged_at INTEGER NOT NULL
+);
+"""
+
+
+def serialize_order(detailed_order):
+    """Canonical JSON text of a detailed order, equal text means equal content"""
+    return json.dumps(detailed_order, sort_keys=True, separators=(',', ':'))
+
+
+def store_file(path):
+    """SQLite file of a snapshot, also for paths configured with the former .json name"""
+    return os.path.splitext(path)[0] + '.db'
+
+
+def legacy_file(path):
+    """The single JSON snapshot file the store replaces"""
+    return os.path.splitext(path)[0] + '.json'
+
+
+class SnapshotStore:
+    def __init__(self, path):
+        self.path = store_file(path)
+        self._lock = threading.Lock()
+        is_new = not os.path.exists(self.path)
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db.executescript(SCHEMA)
+        if is_new:
+            self._import_legacy()
+
+    def _import_legacy(self):
+        legacy = legacy_file(self.path)
+        if not os.path.exists(legacy):
+            return
+        try:
+            with open(legacy, 'r') as f:
+                orders = json.load(f)
+        except json.JSONDecodeError:
+            return
+        if orders:
+            self.save(orders)
+
+    def close(self):
+        self._db.close()
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM orders").fetchone()[0]
+
+    def generation(self):
+        """Counter increased on every save that changed the snapshot"""
+        with self._lock:
+            row = self._db.execute("SELECT value FROM meta WHERE key = 'generation'").fetchone()
+        return int(row[0]) if row else 0
+
+    def positions(self):
+        """Reference numbers by position, without decoding any order"""
+        with self._lock:
+            rows = self._db.execute("SELECT reference_number, position FROM orders ORDER BY position").fetchall()
+        return dict(rows)
+
+    def load_raw(self, reference_number):
+        """Serialized JSON of one order, or None"""
+        with self._lock:
+            row = self._db.execute("SELECT data FROM orders WHERE reference_number = ?", (reference_number,)).fetchone()
+        return row[0] if row else None
+
+    def load(self, reference_number):
+        """Decode one order, or None if it is not in the snapshot"""
+        raw = self.load_raw(reference_number)
+        return json.loads(raw) if raw is not None else None
+
+    def load_all(self):
+        """Decode all orders in their original order"""
+        with self._lock:
+            rows = self._db.execute("SELECT data FROM orders ORDER BY position").fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def save(self, detailed_orders):
+        """Replace the snapshot, only rows whose content changed are written. Purged orders are skipped"""
+        now = int(time.time())
+        new_rows = {
+            detailed_order['order']['referenceNumber']: (position, serialize_order(detailed_order))
+            for position, detailed_order in enumerate(detailed_orders)
+        }
+
+        with self._lock, self._db:
+            current = dict(
+                (ref, (position, data)) for ref, position, data in
+                self._db.execute("SELECT reference_number, position, data FROM orders")
+            )
+            purged = {row[0] for row in self._db.execute("SELECT reference_number FROM purged")}
+            changed = False
+            for ref, (position, data) in new_rows.items():
+                if current.get(ref) == (position, data) or ref in purged:
+                    continue
+                self._db.execute(
+                    "INSERT OR REPLACE INTO orders (reference_number, position, data, updated_at) VALUES (?, ?, ?, ?)",
+                    (ref, position, data, now)
+                )
+                changed = True
+            removed = [(ref,) for ref in current if ref not in new_rows]
+            if removed:
+                self._db.executemany("DELETE FROM orders WHERE reference_number = ?", removed)
+                changed = True
+            if changed:
+                self._bump_generation()
+        return changed
+
+    def _bump_generation(self):
+        self._db.execute(
+            "INSERT INTO meta (key, value) VALUES ('generation', '1') "
+            "ON CONFLICT(key) DO UPDATE SET value = CAST(value AS INTEGER) + 1"
+        )
+
+    def unchanged_since(self, timestamp):
+        """(reference number, serialized JSON) of the orders not written since timestamp"""
+        with self._lock:
+            return self._db.execute(
+                "SELECT reference_number, data FROM orders WHERE updated_at < ? ORDER BY position", (timestamp,)
+            ).fetchall()
+
+    def purged(self):
+        """Reference numbers of the orders removed by retention"""
+        with self._lock:
+            return {row[0] for row in self._db.execute("SELECT reference_number FROM purged")}
+
+    def purge(self, reference_numbers):
+        """Remove orders from the snapshot for good"""
+        now = int(time.time())
+        with self._lock, self._db:
+            self._db.executemany("DELETE FROM orders WHERE reference_number = ?", [(ref,) for ref in reference_numbers])
+            self._db.executemany(
+                "INSERT OR REPLACE INTO purged (reference_number, purged_at) VALUES (?, ?)",
+                [(ref, now) for ref in reference_numbers]
+            )
+            self._bump_generation()
+
+    def vacuum(self):
+        """Return the space of deleted rows to the file system"""
+        with self._lock:
+            self._db.execute("VACUUM")
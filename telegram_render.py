@@ -0,0 +1,174 @@
+"""
+Telegram Message Rendering
+Template based rendering of the Telegram notifications. Reports carry a hash
+of the order fields they show, so identical always_notify reports can be
+skipped until a heartbeat is due.
+"""
+
+import hashlib
+import json
+import os
+import time
+from datetime import datetime
+from functools import lru_cache
+from string import Template
+
+from app_config import DEFAULT_HEARTBEAT_HOURS
+from tesla_stores import TeslaStore
+
+TELEGRAM_STATE_FILE = 'telegram_state.json'
+MAX_DIFFERENCES = 20  # Limit changes listed to avoid message length issues
+MAX_MESSAGE_LENGTH = 4000  # Telegram has a 4096 character limit
+ANSI_CODES = ('\033[91m', '\033[92m', '\033[0m')
+
+HEADER = Template("🚗 <b>$title</b>\n📅 $timestamp\n\n")
+CHANGES_INTRO = Template("📋 Detected changes in your Tesla $noun:\n\n")
+CHANGES_MORE = Template("\n... and $count more changes")
+CHANGES_FOOTER = "\n\n🔄 Check your Tesla account for complete details."
+NO_CHANGES_SINGLE = "✅ No changes detected in your Tesla order\n"
+NO_CHANGES_MULTI = Template("✅ No changes detected in your $count Tesla orders\n")
+NO_CHANGES_FOOTER = "\n📊 Your order status remains the same since the last check."
+ORDER_SEPARATOR = "\n" + "─" * 30 + "\n\n"
+TRUNCATED = "\n\n... <i>(Output truncated due to length)</i>"
+
+# Lines of an order block, each only rendered when its field has a value
+ORDER_LINES = (
+    ('number', Template("<b>📋 Order $number</b>\n")),
+    ('referenceNumber', Template("🔢 Order ID: <code>$referenceNumber</code>\n")),
+    ('orderStatus', Template("📊 Status: <b>$orderStatus</b>\n")),
+    ('modelCode', Template("🚙 Model: <b>$modelCode</b>\n")),
+    ('vin', Template("🆔 VIN: <code>$vin</code>\n")),
+    ('deliveryWindow', Template("📅 Delivery Window: <b>$deliveryWindow</b>\n")),
+    ('etaToDeliveryCenter', Template("🚚 ETA to Delivery: <b>$etaToDeliveryCenter</b>\n")),
+    ('deliveryAppointment', Template("📍 Delivery Appointment: <b>$deliveryAppointment</b>\n")),
+    ('deliveryLocation', Template("🏪 Delivery Location: <b>$deliveryLocation</b>\n")),
+)
+
+def _timestamp():
+    return datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+
+def content_hash(value):
+    """Stable hash of a JSON serializable value"""
+    return hashlib.sha256(json.dumps(value, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+
+@lru_cache(maxsize=None)
+def store_label(location_id):
+    return TeslaStore(location_id).label
+
+
+def order_fields(number, detailed_order):
+    """Extract the fields shown in an order block"""
+    order = detailed_order['order']
+    tasks = detailed_order['details'].get('tasks', {})
+    scheduling = tasks.get('scheduling', {})
+    order_info = tasks.get('registration', {}).get('orderDetails', {})
+    final_payment_data = tasks.get('finalPayment', {}).get('data', {})
+
+    return {
+        'number': number,
+        'referenceNumber': order['referenceNumber'],
+        'orderStatus': order['orderStatus'],
+        'modelCode': order['modelCode'],
+        'vin': order.get('vin'),
+        'deliveryWindow': scheduling.get('deliveryWindowDisplay'),
+        'etaToDeliveryCenter': final_payment_data.get('etaToDeliveryCenter'),
+        'deliveryAppointment': scheduling.get('apptDateTimeAddressStr'),
+        'deliveryLocation': order_info.get('vehicleRoutingLocation') or None,
+    }
+
+
+def render_order_block(fields):
+    """Render one order block from its fields"""
+    if fields['deliveryLocation']:
+        fields = dict(fields, deliveryLocation=store_label(fields['deliveryLocation']))
+    return ''.join(template.substitute(fields) for name, template in ORDER_LINES
+                   if fields[name] not in (None, '', 'N/A'))
+
+
+def render_order_report(detailed_orders):
+    """Render the full order report, returns the message and a hash of its content"""
+    all_fields = [order_fields(i + 1, detailed_order) for i, detailed_order in enumerate(detailed_orders)]
+    blocks = [render_order_block(fields) for fields in all_fields]
+
+    # The hash covers the order content only, not the timestamp in the header
+    message = HEADER.substitute(title='Tesla Order Status Report', timestamp=_timestamp()) + ORDER_SEPARATOR.join(blocks)
+    if len(message) > MAX_MESSAGE_LENGTH:
+        message = message[:3950] + TRUNCATED
+    return message, content_hash(all_fields)
+
+
+def format_order_details_for_telegram(detailed_orders):
+    """Format order details for Telegram message"""
+    return render_order_report(detailed_orders)[0]
+
+
+def format_telegram_message(differences, order_count):
+    """Format differences for Telegram message"""
+    parts = [
+        HEADER.substitute(title='Tesla Order Status Update', timestamp=_timestamp()),
+        CHANGES_INTRO.substitute(noun='order' if order_count == 1 else 'orders'),
+    ]
+
+    for diff in differences[:MAX_DIFFERENCES]:
+        # Remove ANSI color codes for Telegram
+        clean_diff = diff
+        for code in ANSI_CODES:
+            clean_diff = clean_diff.replace(code, '')
+
+        if clean_diff.startswith('- '):
+            parts.append(f"❌ {clean_diff[2:]}\n")
+        elif clean_diff.startswith('+ '):
+            parts.append(f"✅ {clean_diff[2:]}\n")
+        else:
+            parts.append(f"ℹ️ {clean_diff}\n")
+
+    if len(differences) > MAX_DIFFERENCES:
+        parts.append(CHANGES_MORE.substitute(count=len(differences) - MAX_DIFFERENCES))
+    parts.append(CHANGES_FOOTER)
+
+    return ''.join(parts)
+
+
+def format_no_changes_message(order_count):
+    """Format message for when no changes are detected"""
+    return ''.join((
+        HEADER.substitute(title='Tesla Order Status Check', timestamp=_timestamp()),
+        NO_CHANGES_SINGLE if order_count == 1 else NO_CHANGES_MULTI.substitute(count=order_count),
+        NO_CHANGES_FOOTER,
+    ))
+
+
+def load_notify_state(state_file=TELEGRAM_STATE_FILE):
+    """Load what was last sent to Telegram"""
+    if not os.path.exists(state_file):
+        return {}
+    try:
+        with open(state_file, 'r') as f:
+            return json.load(f)
+    except json.JSONDecodeError:
+        return {}
+
+
+def save_notify_state(state, state_file=TELEGRAM_STATE_FILE):
+    """Save what was last sent to Telegram"""
+    with open(state_file, 'w') as f:
+        json.dump(state, f)
+
+
+def is_duplicate_report(report_hash, heartbeat_hours=DEFAULT_HEARTBEAT_HOURS, account='default', state=None):
+    """True if the same report was already sent for the account and no heartbeat is due yet"""
+    if state is None:
+        state = load_notify_state()
+    last_report = state.get('reports', {}).get(account, {})
+    if last_report.get('hash') != report_hash:
+        return False
+    return time.time() - last_report.get('sent_at', 0) < heartbeat_hours * 3600
+
+
+def record_report_sent(report_hash, account='default', state_file=TELEGRAM_STATE_FILE):
+    """Remember the report that was just sent for the account"""
+    state = load_notify_state(state_file)
+    state.setdefault('reports', {})[account] = {'hash': report_hash, 'sent_at': int(time.time())}
+    save_notify_state(state, state_file)
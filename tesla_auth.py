@@ -0,0 +1,386 @@
+#!/usr/bin/env python3
+"""
+Tesla Authentication
+PKCE login and token handling per account, safe to use on headless machines.
+
+When an account has no usable tokens and nobody can log in right away, it is
+parked: the login URL is stored in tesla_auth_pending.json and the account is
+skipped until the login is completed, while other accounts keep polling.
+
+Usage:
+    python3 tesla_auth.py pending                           list parked accounts
+    python3 tesla_auth.py login <account>                   log in interactively
+    python3 tesla_auth.py complete <account> <redirect_url> finish a parked login
+"""
+
+import argparse
+import base64
+import hashlib
+import json
+import os
+import threading
+import time
+import urllib.parse
+import webbrowser
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+from app_config import CONFIG_FILE, DEFAULT_REDIRECT_URI as REDIRECT_URI, ConfigError, load_config
+
+CLIENT_ID = 'ownerapi'
+AUTH_URL = 'https://auth.tesla.com/oauth2/v3/authorize'
+TOKEN_URL = 'https://auth.tesla.com/oauth2/v3/token'
+SCOPE = 'openid email offline_access'
+CODE_CHALLENGE_METHOD = 'S256'
+PENDING_AUTH_FILE = 'tesla_auth_pending.json'
+LOOPBACK_HOSTS = ('localhost', '127.0.0.1', '::1')
+LOOPBACK_TIMEOUT = 600
+
+_pending_lock = threading.Lock()
+_listeners = {}
+
+
+class AuthRequired(Exception):
+    """Raised when an account needs a login before it can be polled again"""
+
+    def __init__(self, account_name, auth_url):
+        super().__init__(f"Account '{account_name}' needs to log in: {auth_url}")
+        self.account_name = account_name
+        self.auth_url = auth_url
+
+
+def generate_code_verifier_and_challenge():
+    code_verifier = base64.urlsafe_b64encode(os.urandom(32)).rstrip(b'=').decode('utf-8')
+    code_challenge = base64.urlsafe_b64encode(hashlib.sha256(code_verifier.encode('utf-8')).digest()).rstrip(
+        b'=').decode('utf-8')
+    return code_verifier, code_challenge
+
+
+def is_loopback(redirect_uri):
+    """True if the redirect URI points to this machine, so a local listener can receive the code"""
+    parsed = urllib.parse.urlparse(redirect_uri)
+    return parsed.scheme == 'http' and parsed.hostname in LOOPBACK_HOSTS
+
+
+class AuthSession:
+    """PKCE state of one login attempt of one account"""
+
+    def __init__(self, account_name, redirect_uri=REDIRECT_URI, state=None, code_verifier=None):
+        self.account_name = account_name
+        self.redirect_uri = redirect_uri
+        self.state = state or os.urandom(16).hex()
+        if code_verifier is None:
+            code_verifier, _ = generate_code_verifier_and_challenge()
+        self.code_verifier = code_verifier
+
+    @property
+    def code_challenge(self):
+        return base64.urlsafe_b64encode(hashlib.sha256(self.code_verifier.encode('utf-8')).digest()).rstrip(
+            b'=').decode('utf-8')
+
+    @property
+    def auth_url(self):
+        auth_params = {
+            'client_id': CLIENT_ID,
+            'redirect_uri': self.redirect_uri,
+            'response_type': 'code',
+            'scope': SCOPE,
+            'state': self.state,
+            'code_challenge': self.code_challenge,
+            'code_challenge_method': CODE_CHALLENGE_METHOD,
+        }
+        return f"{AUTH_URL}?{urllib.parse.urlencode(auth_params)}"
+
+    def code_from_redirect(self, redirected_url):
+        """Extract the authorization code from the URL Tesla redirected to"""
+        query = urllib.parse.parse_qs(urllib.parse.urlparse(redirected_url.strip()).query)
+        if 'code' not in query:
+            raise ValueError("The URL does not contain an authorization code")
+        if query.get('state', [self.state])[0] != self.state:
+            raise ValueError("The URL belongs to another login attempt (state mismatch)")
+        return query['code'][0]
+
+    def exchange(self, auth_code, session=requests):
+        """Exchange the authorization code for tokens"""
+        token_data = {
+            'grant_type': 'authorization_code',
+            'client_id': CLIENT_ID,
+            'code': auth_code,
+            'redirect_uri': self.redirect_uri,
+            'code_verifier': self.code_verifier,
+        }
+        response = session.post(TOKEN_URL, data=token_data)
+        response.raise_for_status()
+        return response.json()
+
+    def to_dict(self):
+        return {
+            'redirect_uri': self.redirect_uri,
+            'state': self.state,
+            'code_verifier': self.code_verifier,
+            'auth_url': self.auth_url,
+            'created_at': int(time.time()),
+        }
+
+    @classmethod
+    def from_dict(cls, account_name, data):
+        return cls(account_name, data['redirect_uri'], data['state'], data['code_verifier'])
+
+
+def save_tokens_to_file(tokens, token_file):
+    with open(token_file, 'w') as f:
+        json.dump(tokens, f)
+    print(f"> Tokens saved to '{token_file}'")
+
+
+def load_tokens_from_file(token_file):
+    with open(token_file, 'r') as f:
+        return json.load(f)
+
+
+def is_token_valid(access_token):
+    jwt_decoded = json.loads(base64.b64decode(access_token.split('.')[1] + '==').decode('utf-8'))
+    return jwt_decoded['exp'] > time.time()
+
+
+def refresh_tokens(refresh_token, session=requests):
+    token_data = {
+        'grant_type': 'refresh_token',
+        'client_id': CLIENT_ID,
+        'refresh_token': refresh_token,
+    }
+    response = session.post(TOKEN_URL, data=token_data)
+    response.raise_for_status()
+    return response.json()
+
+
+def load_pending(pending_file=PENDING_AUTH_FILE):
+    """Load the parked logins by account name"""
+    if not os.path.exists(pending_file):
+        return {}
+    try:
+        with open(pending_file, 'r') as f:
+            return json.load(f)
+    except json.JSONDecodeError:
+        return {}
+
+
+def _save_pending(pending, pending_file):
+    tmp_file = f"{pending_file}.tmp"
+    with open(tmp_file, 'w') as f:
+        json.dump(pending, f, indent=2)
+    os.replace(tmp_file, pending_file)
+
+
+def park_account(account, pending_file=PENDING_AUTH_FILE):
+    """Queue a login for the account, reusing an already parked attempt"""
+    with _pending_lock:
+        pending = load_pending(pending_file)
+        if account.name in pending:
+            auth_session = AuthSession.from_dict(account.name, pending[account.name])
+        else:
+            auth_session = AuthSession(account.name, account.redirect_uri)
+            pending[account.name] = auth_session.to_dict()
+            _save_pending(pending, pending_file)
+    return auth_session
+
+
+def unpark_account(account_name, pending_file=PENDING_AUTH_FILE):
+    with _pending_lock:
+        pending = load_pending(pending_file)
+        if pending.pop(account_name, None) is not None:
+            _save_pending(pending, pending_file)
+
+
+def complete_login(account, redirected_url, auth_session=None, session=requests, pending_file=PENDING_AUTH_FILE):
+    """Finish a login with the URL Tesla redirected to: exchange the code and save the tokens"""
+    if auth_session is None:
+        pending = load_pending(pending_file)
+        if account.name not in pending:
+            raise ValueError(f"No login is pending for account '{account.name}'")
+        auth_session = AuthSession.from_dict(account.name, pending[account.name])
+
+    tokens = auth_session.exchange(auth_session.code_from_redirect(redirected_url), session)
+    save_tokens_to_file(tokens, account.token_file)
+    unpark_account(account.name, pending_file)
+    return tokens
+
+
+class _CallbackHandler(BaseHTTPRequestHandler):
+    on_redirect = None
+
+    def do_GET(self):
+        try:
+            self.on_redirect(f"http://localhost{self.path}")
+            status, text = 200, "Login complete. You can close this window."
+        except (ValueError, requests.RequestException) as e:
+            status, text = 400, f"Login failed: {e}"
+        body = text.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'text/plain; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        if status == 200:
+            threading.Thread(target=self.server.shutdown, daemon=True).start()
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_loopback_listener(account, auth_session, session=requests, timeout=LOOPBACK_TIMEOUT):
+    """Receive the redirect on the loopback redirect URI in a background thread.
+
+    Returns the result dict that is filled in with 'tokens' or 'error', and the thread.
+    """
+    parsed = urllib.parse.urlparse(auth_session.redirect_uri)
+    result = {}
+
+    def on_redirect(url):
+        try:
+            result['tokens'] = complete_login(account, url, auth_session, session)
+        except (ValueError, requests.RequestException) as e:
+            result['error'] = e
+            raise
+
+    handler = type('Handler', (_CallbackHandler,), {'on_redirect': staticmethod(on_redirect)})
+    server = ThreadingHTTPServer((parsed.hostname, parsed.port or 80), handler)
+    # Give up after the timeout so a forgotten login does not keep the port open
+    timer = threading.Timer(timeout, server.shutdown)
+    timer.daemon = True
+
+    def serve():
+        timer.start()
+        try:
+            server.serve_forever()
+        finally:
+            timer.cancel()
+            server.server_close()
+            _listeners.pop(account.name, None)
+
+    thread = threading.Thread(target=serve, name=f"auth-callback-{account.name}", daemon=True)
+    _listeners[account.name] = thread
+    thread.start()
+    return result, thread
+
+
+def login(account, session=requests):
+    """Interactive login: opens the browser and waits for the redirect, returns the tokens"""
+    auth_session = AuthSession(account.name, account.redirect_uri)
+    print("> Opening the browser for authentication:", auth_session.auth_url)
+
+    if is_loopback(auth_session.redirect_uri):
+        result, thread = start_loopback_listener(account, auth_session, session)
+        webbrowser.open(auth_session.auth_url)
+        print("Waiting for the login to complete in the browser...")
+        thread.join()
+        if 'tokens' not in result:
+            raise ValueError(f"Login did not complete: {result.get('error', 'timed out')}")
+        return result['tokens']
+
+    webbrowser.open(auth_session.auth_url)
+    print("After authentication, you’ll be redirected to a new URL. The page might show a 'Page Not Found' error message, but the URL itself is still valid for this purpose.")
+    redirected_url = input("Please enter the redirected URL here: ")
+    return auth_session.exchange(auth_session.code_from_redirect(redirected_url), session)
+
+
+def park_or_listen(account, session=requests):
+    """Park the account and, for loopback redirect URIs, listen for the login in the background"""
+    auth_session = park_account(account)
+    if is_loopback(auth_session.redirect_uri) and account.name not in _listeners:
+        try:
+            start_loopback_listener(account, auth_session, session)
+        except OSError as e:
+            print(f"⚠️ Cannot listen on {auth_session.redirect_uri}: {e}")
+    raise AuthRequired(account.name, auth_session.auth_url)
+
+
+def get_access_token(account, is_interactive, session=requests):
+    """Return a valid access token for the account.
+
+    Raises AuthRequired if a login is needed and nobody is around to do it.
+    """
+    try:
+        tokens = load_tokens_from_file(account.token_file)
+        access_token = tokens['access_token']
+        refresh_token = tokens['refresh_token']
+    except FileNotFoundError:
+        tokens = None
+    except (json.JSONDecodeError, KeyError):
+        print("> Error loading tokens from file. Re-authenticating...")
+        tokens = None
+
+    if tokens is not None:
+        try:
+            if is_token_valid(access_token):
+                unpark_account(account.name)
+                return access_token
+            print("> Access token is not valid. Refreshing tokens...")
+            token_response = refresh_tokens(refresh_token, session)
+            # refresh access token in file
+            tokens['access_token'] = token_response['access_token']
+            save_tokens_to_file(tokens, account.token_file)
+            unpark_account(account.name)
+            return tokens['access_token']
+        except (ValueError, IndexError, KeyError) as e:
+            print(f"> Stored access token is unreadable ({e}). Re-authenticating...")
+        except requests.HTTPError as e:
+            print(f"> Refreshing tokens failed ({e}). Re-authenticating...")
+
+    if not is_interactive:
+        park_or_listen(account, session)
+
+    token_response = login(account, session)
+    if tokens is not None or input("Would you like to save the tokens to a file in the current directory for use in future requests? (y/n): ").lower() == 'y':
+        save_tokens_to_file(token_response, account.token_file)
+    unpark_account(account.name)
+    return token_response['access_token']
+
+
+def find_account(config, name):
+    for account in config.accounts:
+        if account.name == name:
+            return account
+    raise SystemExit(f"❌ Unknown account '{name}'")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Manage Tesla logins of the configured accounts')
+    parser.add_argument('--config', default=CONFIG_FILE, help='Path of the configuration file')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    subparsers.add_parser('pending', help='List accounts waiting for a login')
+    login_parser = subparsers.add_parser('login', help='Log in interactively')
+    login_parser.add_argument('account')
+    complete_parser = subparsers.add_parser('complete', help='Finish a parked login with the redirected URL')
+    complete_parser.add_argument('account')
+    complete_parser.add_argument('redirected_url')
+    args = parser.parse_args()
+
+    try:
+        config = load_config(args.config)
+    except ConfigError as e:
+        raise SystemExit(f"❌ {e}")
+
+    if args.command == 'pending':
+        pending = load_pending()
+        if not pending:
+            print("✅ No logins pending")
+        for name, data in pending.items():
+            print(f"🔑 {name}: {data['auth_url']}")
+    elif args.command == 'login':
+        account = find_account(config, args.account)
+        save_tokens_to_file(login(account), account.token_file)
+        unpark_account(account.name)
+        print(f"✅ Account '{account.name}' logged in")
+    elif args.command == 'complete':
+        account = find_account(config, args.account)
+        try:
+            complete_login(account, args.redirected_url)
+        except (ValueError, requests.RequestException) as e:
+            raise SystemExit(f"❌ {e}")
+        print(f"✅ Account '{account.name}' logged in, it will be polled again on the next run")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,153 +1,87 @@
-import base64
 import json
 import os
 import time
-import hashlib
 import requests
-import webbrowser
-import urllib.parse
+import httpx
 import asyncio
-from datetime import datetime
+import argparse
 
 from tesla_stores import TeslaStore
+from order_history import append_history
+from telegram_render import format_telegram_message, render_order_report, is_duplicate_report, record_report_sent
+from tesla_auth import AuthRequired, get_access_token
+from single_flight import AsyncSingleFlight
+from snapshot_store import SnapshotStore, serialize_order
+from profiling import CycleProfiler, phase
+from request_scheduler import AsyncRequestScheduler, RequestScheduler, PRIORITY_HIGH, PRIORITY_LOW, PRIORITY_NORMAL
+from order_locale import LocaleVariants, locale_tag
+from retention import RetentionWorker
+from app_config import (
+    CONFIG_FILE, ConfigError, ConfigWatcher, Locale, TelegramConfig, order_locale, save_telegram_config,
+    with_telegram,
+)
 from telegram import Bot
 from telegram.error import TelegramError
 
-# Define constants
-CLIENT_ID = 'ownerapi'
-REDIRECT_URI = 'https://auth.tesla.com/void/callback'
-AUTH_URL = 'https://auth.tesla.com/oauth2/v3/authorize'
-TOKEN_URL = 'https://auth.tesla.com/oauth2/v3/token'
-SCOPE = 'openid email offline_access'
-CODE_CHALLENGE_METHOD = 'S256'
-STATE = os.urandom(16).hex()
-TOKEN_FILE = 'tesla_tokens.json'
-ORDERS_FILE = 'tesla_orders.json'
-TELEGRAM_CONFIG_FILE = 'telegram_config.json'
-APP_VERSION = '9.99.9-9999' # we can use a dummy version here, as the API does not check it strictly
+HTTP_TIMEOUT = 30
+
+# One rate limited client for all order requests on the event loop, so connections are pooled
+# and limits are shared across orders, accounts and config reloads. The client is opened by run()
+SESSION = AsyncRequestScheduler(None)
+# Logging in may prompt for input, it runs in a worker thread with a blocking session
+AUTH_SESSION = RequestScheduler(requests.Session())
+# Telegram bots by token, reused for every message sent on the event loop
+BOTS = {}
+# Localized texts of every locale an order was fetched in, kept across cycles
+LOCALE_VARIANTS = LocaleVariants()
+# Snapshots written before orders carried their locale were fetched in en_DE
+LEGACY_LOCALE = locale_tag(Locale())
 
 def color_text(text, color_code):
     return f"\033[{color_code}m{text}\033[0m"
 
-def generate_code_verifier_and_challenge():
-    code_verifier = base64.urlsafe_b64encode(os.urandom(32)).rstrip(b'=').decode('utf-8')
-    code_challenge = base64.urlsafe_b64encode(hashlib.sha256(code_verifier.encode('utf-8')).digest()).rstrip(
-        b'=').decode('utf-8')
-    return code_verifier, code_challenge
-
-
-def get_auth_code():
-    auth_params = {
-        'client_id': CLIENT_ID,
-        'redirect_uri': REDIRECT_URI,
-        'response_type': 'code',
-        'scope': SCOPE,
-        'state': STATE,
-        'code_challenge': code_challenge,
-        'code_challenge_method': CODE_CHALLENGE_METHOD,
-    }
-    auth_url = f"{AUTH_URL}?{urllib.parse.urlencode(auth_params)}"
-    print(color_text("> Opening the browser for authentication:", '94'), auth_url)
-    webbrowser.open(auth_url)
-    print(color_text("After authentication, you’ll be redirected to a new URL. The page might show a 'Page Not Found' error message, but the URL itself is still valid for this purpose.", '90'))
-    redirected_url = input(color_text("Please enter the redirected URL here: ", '93'))
-    parsed_url = urllib.parse.urlparse(redirected_url)
-    return urllib.parse.parse_qs(parsed_url.query).get('code')[0]
-
-
-def exchange_code_for_tokens(auth_code):
-    token_data = {
-        'grant_type': 'authorization_code',
-        'client_id': CLIENT_ID,
-        'code': auth_code,
-        'redirect_uri': REDIRECT_URI,
-        'code_verifier': code_verifier,
-    }
-    response = requests.post(TOKEN_URL, data=token_data)
-    response.raise_for_status()
-    return response.json()
-
-
-def save_tokens_to_file(tokens):
-    with open(TOKEN_FILE, 'w') as f:
-        json.dump(tokens, f)
-    print(color_text(f"> Tokens saved to '{TOKEN_FILE}'", '94'))
-
-
-def load_tokens_from_file():
-    with open(TOKEN_FILE, 'r') as f:
-        return json.load(f)
-
-
-def is_token_valid(access_token):
-    jwt_decoded = json.loads(base64.b64decode(access_token.split('.')[1] + '==').decode('utf-8'))
-    return jwt_decoded['exp'] > time.time()
-
-
-def refresh_tokens(refresh_token):
-    token_data = {
-        'grant_type': 'refresh_token',
-        'client_id': CLIENT_ID,
-        'refresh_token': refresh_token,
-    }
-    response = requests.post(TOKEN_URL, data=token_data)
-    response.raise_for_status()
-    return response.json()
-
 
-def retrieve_orders(access_token):
+async def retrieve_orders(access_token):
     headers = {'Authorization': f'Bearer {access_token}'}
     api_url = 'https://owner-api.teslamotors.com/api/1/users/orders'
-    response = requests.get(api_url, headers=headers)
+    response = await SESSION.get(api_url, headers=headers)
     response.raise_for_status()
     return response.json()['response']
 
 
-def get_order_details(order_id, access_token):
+def order_priority(order):
+    """Orders nearing delivery are fetched first when requests are rate limited"""
+    if order.get('orderStatus') in ('DELIVERED', 'CANCELLED'):
+        return PRIORITY_LOW
+    if order.get('vin'):
+        return PRIORITY_HIGH
+    return PRIORITY_NORMAL
+
+
+async def get_order_details(order_id, access_token, locale, app_version, priority=PRIORITY_NORMAL):
     headers = {'Authorization': f'Bearer {access_token}'}
-    api_url = f'https://akamai-apigateway-vfx.tesla.com/tasks?deviceLanguage=en&deviceCountry=DE&referenceNumber={order_id}&appVersion={APP_VERSION}'
-    response = requests.get(api_url, headers=headers)
+    api_url = f'https://akamai-apigateway-vfx.tesla.com/tasks?deviceLanguage={locale.language}&deviceCountry={locale.country}&referenceNumber={order_id}&appVersion={app_version}'
+    response = await SESSION.get(api_url, priority, headers=headers)
     response.raise_for_status()
     return response.json()
 
 
-def save_orders_to_file(orders):
-    with open(ORDERS_FILE, 'w') as f:
-        json.dump(orders, f)
-    print(color_text(f"\n> Orders saved to '{ORDERS_FILE}'", '94'))
+async def fetch_order_details(order_id, access_token, locale, app_version, priority=PRIORITY_NORMAL):
+    """Order details in the given locale, composed from cached texts when the content is unchanged"""
+    tag = locale_tag(locale)
+    order_details = LOCALE_VARIANTS.compose(order_id, tag)
+    if order_details is None:
+        order_details = await get_order_details(order_id, access_token, locale, app_version, priority)
+        LOCALE_VARIANTS.record(order_id, tag, order_details)
+    return order_details
 
 
-def load_orders_from_file():
-    if os.path.exists(ORDERS_FILE):
-        with open(ORDERS_FILE, 'r') as f:
-            return json.load(f)
-    return None
+def save_orders_to_file(orders, store):
+    store.save(orders)
+    print(color_text(f"\n> Orders saved to '{store.path}'", '94'))
 
 
-def load_telegram_config():
-    """Load Telegram configuration from file"""
-    if not os.path.exists(TELEGRAM_CONFIG_FILE):
-        return None
-    
-    try:
-        with open(TELEGRAM_CONFIG_FILE, 'r') as f:
-            config = json.load(f)
-            
-        if not config.get('bot_token') or not config.get('chat_id'):
-            return None
-        
-        # Set default values for new options if not present
-        if 'enabled' not in config:
-            config['enabled'] = True
-        if 'always_notify' not in config:
-            config['always_notify'] = False
-            
-        return config
-    except (json.JSONDecodeError, KeyError):
-        return None
-
-
-def setup_telegram_config():
+def setup_telegram_config(config_file):
     """Interactive setup for Telegram configuration"""
     print(color_text("\n> Setting up Telegram notifications...", '94'))
     print(color_text("To enable Telegram notifications, you need:", '90'))
@@ -167,27 +101,37 @@ def setup_telegram_config():
     always_notify_input = input(color_text("Send notifications even when no changes are detected? (y/n): ", '93')).strip().lower()
     always_notify = always_notify_input == 'y'
     
-    config = {
-        'bot_token': bot_token,
-        'chat_id': chat_id,
-        'enabled': True,
-        'always_notify': always_notify
-    }
+    telegram = TelegramConfig(bot_token=bot_token, chat_id=chat_id, always_notify=always_notify)
     
     try:
-        with open(TELEGRAM_CONFIG_FILE, 'w') as f:
-            json.dump(config, f, indent=2)
-        print(color_text(f"> Telegram configuration saved to '{TELEGRAM_CONFIG_FILE}'", '94'))
-        return config
+        save_telegram_config(telegram, config_file)
+        print(color_text(f"> Telegram configuration saved to '{config_file}'", '94'))
+        return telegram
     except Exception as e:
         print(color_text(f"Error saving Telegram config: {e}", '91'))
         return None
 
 
+async def get_bot(bot_token):
+    """The Telegram bot of a token, initialized on first use"""
+    bot = BOTS.get(bot_token)
+    if bot is None:
+        bot = Bot(token=bot_token)
+        await bot.initialize()
+        BOTS[bot_token] = bot
+    return bot
+
+
+async def close_bots():
+    for bot in BOTS.values():
+        await bot.shutdown()
+    BOTS.clear()
+
+
 async def send_telegram_message(bot_token, chat_id, message):
     """Send a message to Telegram"""
     try:
-        bot = Bot(token=bot_token)
+        bot = await get_bot(bot_token)
         await bot.send_message(chat_id=chat_id, text=message, parse_mode='HTML')
         return True
     except TelegramError as e:
@@ -198,107 +142,6 @@ async def send_telegram_message(bot_token, chat_id, message):
         return False
 
 
-def format_telegram_message(differences, order_count):
-    """Format differences for Telegram message"""
-    timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-    
-    message = f"🚗 <b>Tesla Order Status Update</b>\n"
-    message += f"📅 {timestamp}\n\n"
-    
-    if order_count == 1:
-        message += f"📋 Detected changes in your Tesla order:\n\n"
-    else:
-        message += f"📋 Detected changes in your Tesla orders:\n\n"
-    
-    # Process differences and make them more readable
-    for diff in differences[:20]:  # Limit to first 20 changes to avoid message length issues
-        # Remove ANSI color codes for Telegram
-        clean_diff = diff.replace('\033[91m', '').replace('\033[92m', '').replace('\033[0m', '')
-        
-        if clean_diff.startswith('- '):
-            message += f"❌ {clean_diff[2:]}\n"
-        elif clean_diff.startswith('+ '):
-            message += f"✅ {clean_diff[2:]}\n"
-        else:
-            message += f"ℹ️ {clean_diff}\n"
-    
-    if len(differences) > 20:
-        message += f"\n... and {len(differences) - 20} more changes"
-    
-    message += f"\n\n🔄 Check your Tesla account for complete details."
-    
-    return message
-
-
-def format_no_changes_message(order_count):
-    """Format message for when no changes are detected"""
-    timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-    
-    message = f"🚗 <b>Tesla Order Status Check</b>\n"
-    message += f"📅 {timestamp}\n\n"
-    
-    if order_count == 1:
-        message += f"✅ No changes detected in your Tesla order\n"
-    else:
-        message += f"✅ No changes detected in your {order_count} Tesla orders\n"
-    
-    message += f"\n📊 Your order status remains the same since the last check."
-    
-    return message
-
-
-def format_order_details_for_telegram(detailed_orders):
-    """Format order details for Telegram message"""
-    timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-    
-    message = f"🚗 <b>Tesla Order Status Report</b>\n"
-    message += f"📅 {timestamp}\n\n"
-    
-    for i, detailed_order in enumerate(detailed_orders):
-        order = detailed_order['order']
-        order_details = detailed_order['details']
-        scheduling = order_details.get('tasks', {}).get('scheduling', {})
-        order_info = order_details.get('tasks', {}).get('registration', {}).get('orderDetails', {})
-        final_payment_data = order_details.get('tasks', {}).get('finalPayment', {}).get('data', {})
-        
-        if i > 0:
-            message += "\n" + "─" * 30 + "\n\n"
-        
-        message += f"<b>📋 Order {i+1}</b>\n"
-        message += f"🔢 Order ID: <code>{order['referenceNumber']}</code>\n"
-        message += f"📊 Status: <b>{order['orderStatus']}</b>\n"
-        message += f"🚙 Model: <b>{order['modelCode']}</b>\n"
-        
-        if order.get('vin'):
-            message += f"🆔 VIN: <code>{order['vin']}</code>\n"
-        
-        # Delivery information
-        delivery_window = scheduling.get('deliveryWindowDisplay', 'N/A')
-        if delivery_window != 'N/A':
-            message += f"📅 Delivery Window: <b>{delivery_window}</b>\n"
-        
-        eta_delivery = final_payment_data.get('etaToDeliveryCenter', 'N/A')
-        if eta_delivery != 'N/A':
-            message += f"🚚 ETA to Delivery: <b>{eta_delivery}</b>\n"
-        
-        delivery_appt = scheduling.get('apptDateTimeAddressStr', 'N/A')
-        if delivery_appt != 'N/A':
-            message += f"📍 Delivery Appointment: <b>{delivery_appt}</b>\n"
-        
-        # Vehicle routing location
-        routing_location = order_info.get('vehicleRoutingLocation', 0)
-        if routing_location:
-            from tesla_stores import TeslaStore
-            store_name = TeslaStore(routing_location).label
-            message += f"🏪 Delivery Location: <b>{store_name}</b>\n"
-    
-    # Limit message length (Telegram has a 4096 character limit)
-    if len(message) > 4000:
-        message = message[:3950] + "\n\n... <i>(Output truncated due to length)</i>"
-    
-    return message
-
-
 def compare_dicts(old_dict, new_dict, path=''):
     differences = []
     for key in old_dict:
@@ -317,162 +160,341 @@ def compare_dicts(old_dict, new_dict, path=''):
     return differences
 
 
-def compare_orders(old_orders, new_orders):
+def compare_orders(old_order, new_order, path):
+    """Differences between two versions of an order, ignoring texts that only differ by locale"""
+    old_order, new_order = dict(old_order), dict(new_order)
+    old_locale = old_order.pop('locale', LEGACY_LOCALE)
+    new_locale = new_order.pop('locale', LEGACY_LOCALE)
+    if old_locale != new_locale:
+        # Texts are only comparable in the same locale, so the new details are compared in the old one if known
+        reference_number = new_order['order']['referenceNumber']
+        translated = LOCALE_VARIANTS.translate(reference_number, new_order['details'], old_locale)
+        if translated is not None:
+            new_order['details'] = translated
+        note = 'texts compared in the same locale' if translated is not None else 'translated texts show up as changes'
+        print(color_text(f"ℹ️ {reference_number}: locale changed from {old_locale} to {new_locale}, {note}", '90'))
+    return compare_dicts(old_order, new_order, path)
+
+
+def compare_with_snapshot(store, new_orders):
     differences = []
-    for i, old_order in enumerate(old_orders):
-        if i < len(new_orders):
-            differences.extend(compare_dicts(old_order, new_orders[i], path=f'Order {i}.'))
-        else:
-            differences.append(color_text(f"- Removed order {i}", '91'))
-    for i in range(len(old_orders), len(new_orders)):
-        differences.append(color_text(f"+ Added order {i}", '92'))
+    old_positions = store.positions()
+    # Orders purged by retention while this run was polling are neither added nor removed
+    purged = store.purged()
+    new_references = set()
+    for i, new_order in enumerate(new_orders):
+        reference_number = new_order['order']['referenceNumber']
+        new_references.add(reference_number)
+        if reference_number in purged:
+            continue
+        if reference_number not in old_positions:
+            differences.append(color_text(f"+ Added order {i}", '92'))
+            continue
+        # Unchanged orders are recognised by their serialized form and never decoded
+        old_raw = store.load_raw(reference_number)
+        if old_raw == serialize_order(new_order):
+            continue
+        differences.extend(compare_orders(json.loads(old_raw), new_order, path=f'Order {i}.'))
+    for reference_number, position in old_positions.items():
+        if reference_number not in new_references and reference_number not in purged:
+            differences.append(color_text(f"- Removed order {position}", '91'))
     return differences
 
 
-# Main script logic
-print(color_text("\n> Start retrieving the information. Please be patient...\n", '94'))
+def authenticate(account, is_interactive):
+    """Return a valid access token for the account, or None if it is parked until it logs in"""
+    try:
+        return get_access_token(account, is_interactive, AUTH_SESSION)
+    except AuthRequired as e:
+        print(color_text(f"🔑 Account '{account.name}' is parked until it logs in, other accounts keep polling.", '93'))
+        print(color_text(f"   Open {e.auth_url}", '90'))
+        print(color_text(f"   then run: python3 tesla_auth.py complete {account.name} '<redirected URL>'", '90'))
+        return None
 
-# Check if running in non-interactive mode (like cron)
-is_interactive = os.isatty(0)  # Check if stdin is a terminal
 
-# Load or setup Telegram configuration
-telegram_config = load_telegram_config()
-if not telegram_config and is_interactive:
-    setup_choice = input(color_text("Would you like to set up Telegram notifications? (y/n): ", '93')).lower()
-    if setup_choice == 'y':
-        telegram_config = setup_telegram_config()
+async def notify_telegram(telegram, message, success_text):
+    """Send a Telegram message and report the outcome, returns True on success"""
+    try:
+        with phase('notify'):
+            success = await send_telegram_message(
+                telegram.bot_token, 
+                telegram.chat_id, 
+                message
+            )
+        if success:
+            print(color_text(success_text, '92'))
+        else:
+            print(color_text("❌ Failed to send Telegram notification", '91'))
+        return success
+    except Exception as e:
+        print(color_text(f"❌ Error sending Telegram notification: {e}", '91'))
+        return False
 
-code_verifier, code_challenge = generate_code_verifier_and_challenge()
 
-if os.path.exists(TOKEN_FILE):
-    try:
-        token_file = load_tokens_from_file()
-        access_token = token_file['access_token']
-        refresh_token = token_file['refresh_token']
-
-        if not is_token_valid(access_token):
-            print(color_text("> Access token is not valid. Refreshing tokens...", '94'))
-            token_response = refresh_tokens(refresh_token)
-            access_token = token_response['access_token']
-            # refresh access token in file
-            token_file['access_token'] = access_token
-            save_tokens_to_file(token_file)
-
-    except (json.JSONDecodeError, KeyError) as e:
-        print(color_text("> Error loading tokens from file. Re-authenticating...", '94'))
-        token_response = exchange_code_for_tokens(get_auth_code())
-        access_token = token_response['access_token']
-        refresh_token = token_response['refresh_token']
-        save_tokens_to_file(token_response)
-else:
-    if not is_interactive:
-        print(color_text("❌ No tokens found and running in non-interactive mode. Please run the script manually first to authenticate.", '91'))
-        exit(1)
-    
-    token_response = exchange_code_for_tokens(get_auth_code())
-    access_token = token_response['access_token']
-    refresh_token = token_response['refresh_token']
-    if input(color_text("Would you like to save the tokens to a file in the current directory for use in future requests? (y/n): ", '93')).lower() == 'y':
-        save_tokens_to_file(token_response)
-
-old_orders = load_orders_from_file()
-new_orders = retrieve_orders(access_token)
-
-# Retrieve detailed order information
-detailed_new_orders = []
-for order in new_orders:
-    order_id = order['referenceNumber']
-    order_details = get_order_details(order_id, access_token)
-    detailed_order = {
-        'order': order,
-        'details': order_details
-    }
-    detailed_new_orders.append(detailed_order)
-
-if old_orders:
-    differences = compare_orders(old_orders, detailed_new_orders)
-    if differences:
-        print(color_text("Differences found:", '90'))
-        for diff in differences:
-            print(diff)
-        save_orders_to_file(detailed_new_orders)
+def print_order_information(detailed_orders):
+    for detailed_order in detailed_orders:
+        order = detailed_order['order']
+        order_details = detailed_order['details']
+        scheduling = order_details.get('tasks', {}).get('scheduling', {})
+        order_info = order_details.get('tasks', {}).get('registration', {}).get('orderDetails', {})
+        final_payment_data = order_details.get('tasks', {}).get('finalPayment', {}).get('data', {})
+
+        print(f"\n{'-'*45}")
+        print(f"{'ORDER INFORMATION':^45}")
+        print(f"{'-'*45}")
+
+        print(f"{color_text('Order Details:', '94')}")
+        print(f"{color_text('- Order ID:', '94')} {order['referenceNumber']}")
+        print(f"{color_text('- Status:', '94')} {order['orderStatus']}")
+        print(f"{color_text('- Model:', '94')} {order['modelCode']}")
+        print(f"{color_text('- VIN:', '94')} {order.get('vin', 'N/A')}")
         
-        # Send Telegram notification if configured and enabled
-        if telegram_config and telegram_config.get('enabled', True):
-            print(color_text("\n> Sending Telegram notification for changes...", '94'))
-            telegram_message = format_telegram_message(differences, len(detailed_new_orders))
+        print(f"\n{color_text('Reservation Details:', '94')}")
+        print(f"{color_text('- Reservation Date:', '94')} {order_info.get('reservationDate', 'N/A')}")
+        print(f"{color_text('- Order Booked Date:', '94')} {order_info.get('orderBookedDate', 'N/A')}")
+
+        print(f"\n{color_text('Vehicle Status:', '94')}")
+        print(f"{color_text('- Vehicle Odometer:', '94')} {order_info.get('vehicleOdometer', 'N/A')} {order_info.get('vehicleOdometerType', 'N/A')}")
+
+        print(f"\n{color_text('Delivery Information:', '94')}")
+        print(f"{color_text('- Routing Location:', '94')} {order_info.get('vehicleRoutingLocation', 'N/A')} ({TeslaStore(order_info.get('vehicleRoutingLocation', 0)).label})")
+        print(f"{color_text('- Delivery Window:', '94')} {scheduling.get('deliveryWindowDisplay', 'N/A')}")
+        print(f"{color_text('- ETA to Delivery Center:', '94')} {final_payment_data.get('etaToDeliveryCenter', 'N/A')}")
+        print(f"{color_text('- Delivery Appointment:', '94')} {scheduling.get('apptDateTimeAddressStr', 'N/A')}")
+
+        print(f"{'-'*45}\n")
+
+
+async def fetch_detailed_orders(orders, access_token, account, config, order_details_flight):
+    """Fetch the details of all orders concurrently, sharing fetches of orders watched by several accounts"""
+    semaphore = asyncio.Semaphore(config.max_concurrency)
+
+    async def fetch(order):
+        order_id = order['referenceNumber']
+        locale = order_locale(account, order_id)
+        async with semaphore:
+            order_details = await order_details_flight.do(
+                (order_id, locale), fetch_order_details,
+                order_id, access_token, locale, config.app_version, order_priority(order)
+            )
+        return {
+            'order': order,
+            'details': order_details,
+            'locale': locale_tag(locale),
+        }
+
+    # Start orders nearing delivery first, results keep the original order
+    by_priority = sorted(range(len(orders)), key=lambda i: order_priority(orders[i]))
+    fetched = dict(zip(by_priority, await asyncio.gather(*(fetch(orders[i]) for i in by_priority))))
+    return [fetched[i] for i in range(len(orders))]
+
+
+async def fetch_account(account, config, is_interactive, order_details_flight):
+    """Fetch the orders of one account, returns (store, detailed orders) or None if the account is parked"""
+    with phase('auth'):
+        access_token = await asyncio.to_thread(authenticate, account, is_interactive)
+    if access_token is None:
+        return None
+
+    store = SnapshotStore(account.orders_file)
+    try:
+        with phase('list orders'):
+            # Orders purged by retention are no longer polled
+            purged = store.purged()
+            new_orders = [order for order in await retrieve_orders(access_token) if order['referenceNumber'] not in purged]
+
+        # Retrieve detailed order information
+        with phase('fetch details'):
+            detailed_new_orders = await fetch_detailed_orders(new_orders, access_token, account, config, order_details_flight)
+    except BaseException:
+        store.close()
+        raise
+    return store, detailed_new_orders
+
+
+async def poll_account(account, config, is_interactive, order_details_flight):
+    """Like fetch_account, but a failing account only reports its error so the other accounts keep polling"""
+    try:
+        return await fetch_account(account, config, is_interactive, order_details_flight)
+    except Exception as e:
+        print(color_text(f"❌ Polling account '{account.name}' failed: {e}", '91'))
+        return None
+
+
+async def report_account(account, config, is_interactive, store, detailed_new_orders):
+    """Compare, save and report the fetched orders of one account"""
+    if len(config.accounts) > 1:
+        print(color_text(f"\n> Account '{account.name}'", '94'))
+
+    telegram = config.telegram
+    if len(store):
+        with phase('persist'):
+            await asyncio.to_thread(append_history, detailed_new_orders, history_file=account.history_file)
+        # Diffing decodes and walks every changed order, it runs off the event loop
+        with phase('diff'):
+            differences = await asyncio.to_thread(compare_with_snapshot, store, detailed_new_orders)
+        if differences:
+            print(color_text("Differences found:", '90'))
+            for diff in differences:
+                print(diff)
+            with phase('persist'):
+                await asyncio.to_thread(save_orders_to_file, detailed_new_orders, store)
             
-            # Run the async function
-            try:
-                success = asyncio.run(send_telegram_message(
-                    telegram_config['bot_token'], 
-                    telegram_config['chat_id'], 
-                    telegram_message
-                ))
-                if success:
-                    print(color_text("✅ Telegram notification sent successfully!", '92'))
+            # Send Telegram notification if configured and enabled
+            if telegram and telegram.enabled:
+                print(color_text("\n> Sending Telegram notification for changes...", '94'))
+                with phase('render'):
+                    telegram_message = format_telegram_message(differences, len(detailed_new_orders))
+                await notify_telegram(telegram, telegram_message, "✅ Telegram notification sent successfully!")
+            elif telegram and not telegram.enabled:
+                print(color_text("ℹ️ Telegram notifications are disabled", '90'))
+        else:
+            print(color_text("No differences found.", '90'))
+            # Moves the snapshot to the current locale, only rows whose serialized form changed are written
+            with phase('persist'):
+                await asyncio.to_thread(store.save, detailed_new_orders)
+
+            # Send notification based on always_notify setting
+            if telegram and telegram.enabled and telegram.always_notify:
+                # When always_notify is true, send full order details instead of just "no changes"
+                with phase('render'):
+                    telegram_message, report_hash = render_order_report(detailed_new_orders)
+
+                if is_duplicate_report(report_hash, telegram.heartbeat_hours, account.name):
+                    print(color_text(f"ℹ️ Order details unchanged since the last report, next heartbeat within {telegram.heartbeat_hours}h", '90'))
                 else:
-                    print(color_text("❌ Failed to send Telegram notification", '91'))
-            except Exception as e:
-                print(color_text(f"❌ Error sending Telegram notification: {e}", '91'))
-        elif telegram_config and not telegram_config.get('enabled', True):
-            print(color_text("ℹ️ Telegram notifications are disabled", '90'))
-    else:
-        print(color_text("No differences found.", '90'))
+                    print(color_text("\n> Sending Telegram notification with order details...", '94'))
+                    if await notify_telegram(telegram, telegram_message, "✅ Telegram notification with order details sent successfully!"):
+                        record_report_sent(report_hash, account.name)
         
-        # Send notification based on always_notify setting
-        if telegram_config and telegram_config.get('enabled', True) and telegram_config.get('always_notify', False):
-            print(color_text("\n> Sending Telegram notification with order details...", '94'))
-            # When always_notify is true, send full order details instead of just "no changes"
-            telegram_message = format_order_details_for_telegram(detailed_new_orders)
-            
-            try:
-                success = asyncio.run(send_telegram_message(
-                    telegram_config['bot_token'], 
-                    telegram_config['chat_id'], 
-                    telegram_message
-                ))
-                if success:
-                    print(color_text("✅ Telegram notification with order details sent successfully!", '92'))
-                else:
-                    print(color_text("❌ Failed to send Telegram notification", '91'))
-            except Exception as e:
-                print(color_text(f"❌ Error sending Telegram notification: {e}", '91'))
-    
-else:
-    # ask user if they want to save the new orders to a file for comparison next time
-    if is_interactive and input(color_text("Would you like to save the order information to a file for future comparison? (y/n): ", '93')).lower() == 'y':
-        save_orders_to_file(detailed_new_orders)
-
-for detailed_order in detailed_new_orders:
-    order = detailed_order['order']
-    order_details = detailed_order['details']
-    scheduling = order_details.get('tasks', {}).get('scheduling', {})
-    order_info = order_details.get('tasks', {}).get('registration', {}).get('orderDetails', {})
-    final_payment_data = order_details.get('tasks', {}).get('finalPayment', {}).get('data', {})
-
-    print(f"\n{'-'*45}")
-    print(f"{'ORDER INFORMATION':^45}")
-    print(f"{'-'*45}")
-
-    print(f"{color_text('Order Details:', '94')}")
-    print(f"{color_text('- Order ID:', '94')} {order['referenceNumber']}")
-    print(f"{color_text('- Status:', '94')} {order['orderStatus']}")
-    print(f"{color_text('- Model:', '94')} {order['modelCode']}")
-    print(f"{color_text('- VIN:', '94')} {order.get('vin', 'N/A')}")
-    
-    print(f"\n{color_text('Reservation Details:', '94')}")
-    print(f"{color_text('- Reservation Date:', '94')} {order_info.get('reservationDate', 'N/A')}")
-    print(f"{color_text('- Order Booked Date:', '94')} {order_info.get('orderBookedDate', 'N/A')}")
+    else:
+        # ask user if they want to save the new orders to a file for comparison next time,
+        # without a terminal (cron, daemon) the first snapshot is saved right away
+        if not is_interactive or input(color_text("Would you like to save the order information to a file for future comparison? (y/n): ", '93')).lower() == 'y':
+            with phase('persist'):
+                save_orders_to_file(detailed_new_orders, store)
+                append_history(detailed_new_orders, history_file=account.history_file)
+
+    print_order_information(detailed_new_orders)
+    return True
+
+
+async def run_once(config, is_interactive):
+    """Check every configured account once, returns True if all of them succeeded"""
+    for scheduler in (SESSION, AUTH_SESSION):
+        scheduler.configure(config.rate_limits)
+        scheduler.reset_stats()
+    # Orders shared between accounts are fetched once per cycle
+    order_details_flight = AsyncSingleFlight(ttl=config.order_details_ttl)
+    LOCALE_VARIANTS.freshness = config.order_details_ttl
+    LOCALE_VARIANTS.expire()
+
+    if is_interactive:
+        # Logging in may prompt, so accounts are polled one after the other
+        polled = [await poll_account(account, config, is_interactive, order_details_flight) for account in config.accounts]
+    else:
+        polled = await asyncio.gather(*(
+            poll_account(account, config, is_interactive, order_details_flight) for account in config.accounts
+        ))
+
+    # Results are reported one account at a time, so the output stays readable
+    success = True
+    for account, result in zip(config.accounts, polled):
+        if result is None:
+            success = False
+            continue
+        store, detailed_new_orders = result
+        try:
+            success = await report_account(account, config, is_interactive, store, detailed_new_orders) and success
+        except Exception as e:
+            # One failing account does not keep the others from being reported
+            print(color_text(f"❌ Checking account '{account.name}' failed: {e}", '91'))
+            success = False
+        finally:
+            store.close()
+
+    if order_details_flight.saved_calls:
+        stats = order_details_flight.stats()
+        print(color_text(f"> Order details: {stats['upstream_calls']} fetched, {stats['saved_calls']} upstream calls saved "
+                         f"({stats['shared_calls']} shared in flight, {stats['cache_hits']} from cache)", '90'))
+    if LOCALE_VARIANTS.composed:
+        print(color_text(f"> Order details: {LOCALE_VARIANTS.composed} composed from cached texts of another locale", '90'))
+
+    # Only report the rate limiting when it actually slowed the run down
+    for scheduler in (AUTH_SESSION, SESSION):
+        for host, stats in scheduler.stats().items():
+            if stats['throttled'] or stats['max_wait'] >= 1:
+                print(color_text(f"> {host}: {stats['requests']} requests, waited {stats['total_wait']:.1f}s "
+                                 f"(max {stats['max_wait']:.1f}s, max queue depth {stats['max_queue_depth']}), "
+                                 f"throttled {stats['throttled']}x", '90'))
+    return success
+
+
+async def run_daemon(watcher):
+    """Poll forever, picking up configuration changes between and during waits"""
+    RetentionWorker(lambda: watcher.config).start()
+    while True:
+        try:
+            await run_once(watcher.config, is_interactive=False)
+        except Exception as e:
+            # Network errors and the like are retried on the next cycle instead of ending the daemon
+            print(color_text(f"❌ Poll cycle failed, retrying in {watcher.config.poll_interval}s: {e}", '91'))
+
+        next_run = time.time() + watcher.config.poll_interval
+        while time.time() < next_run:
+            await asyncio.sleep(min(5, max(0, next_run - time.time())))
+            if watcher.poll():
+                print(color_text("> Configuration reloaded", '94'))
+                next_run = min(next_run, time.time() + watcher.config.poll_interval)
+
+
+async def run(args, watcher, config, is_interactive):
+    """Run the selected mode on one event loop, returns False if a check failed"""
+    async with httpx.AsyncClient(timeout=HTTP_TIMEOUT) as client:
+        SESSION.session = client
+        try:
+            if args.profile:
+                # Profile exactly one cycle, also when --daemon is given
+                with CycleProfiler(args.profile) as profiler:
+                    success = await run_once(config, is_interactive)
+                profiler.report()
+                return success
+            if args.daemon:
+                await run_daemon(watcher)
+            return await run_once(config, is_interactive)
+        finally:
+            await close_bots()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check the status of your Tesla orders')
+    parser.add_argument('--config', default=CONFIG_FILE, help='Path of the configuration file')
+    parser.add_argument('--daemon', action='store_true', help='Keep running and poll every poll_interval seconds')
+    parser.add_argument('--profile', nargs='?', const='tesla_profile', metavar='PREFIX',
+                        help='Profile one poll cycle and write PREFIX.pstats and PREFIX.collapsed (default prefix: tesla_profile)')
+    args = parser.parse_args()
+
+    print(color_text("\n> Start retrieving the information. Please be patient...\n", '94'))
+
+    # Check if running in non-interactive mode (like cron)
+    is_interactive = os.isatty(0) and not args.daemon  # Check if stdin is a terminal
+
+    try:
+        watcher = ConfigWatcher(args.config)
+    except ConfigError as e:
+        print(color_text(f"❌ {e}", '91'))
+        exit(1)
+    config = watcher.config
 
-    print(f"\n{color_text('Vehicle Status:', '94')}")
-    print(f"{color_text('- Vehicle Odometer:', '94')} {order_info.get('vehicleOdometer', 'N/A')} {order_info.get('vehicleOdometerType', 'N/A')}")
+    # Load or setup Telegram configuration
+    if not config.telegram and is_interactive:
+        setup_choice = input(color_text("Would you like to set up Telegram notifications? (y/n): ", '93')).lower()
+        if setup_choice == 'y':
+            config = with_telegram(config, setup_telegram_config(config.telegram_config_file))
 
-    print(f"\n{color_text('Delivery Information:', '94')}")
-    print(f"{color_text('- Routing Location:', '94')} {order_info.get('vehicleRoutingLocation', 'N/A')} ({TeslaStore(order_info.get('vehicleRoutingLocation', 0)).label})")
-    print(f"{color_text('- Delivery Window:', '94')} {scheduling.get('deliveryWindowDisplay', 'N/A')}")
-    print(f"{color_text('- ETA to Delivery Center:', '94')} {final_payment_data.get('etaToDeliveryCenter', 'N/A')}")
-    print(f"{color_text('- Delivery Appointment:', '94')} {scheduling.get('apptDateTimeAddressStr', 'N/A')}")
+    if not asyncio.run(run(args, watcher, config, is_interactive)):
+        exit(1)
 
-    print(f"{'-'*45}\n")
 
+if __name__ == "__main__":
+    main()
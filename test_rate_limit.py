@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+Test script for the request scheduler
+Runs the scheduler against a local stub server that enforces a rate limit
+the way the Tesla endpoints do (429 with Retry-After)
+"""
+
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+import requests
+
+from request_scheduler import PRIORITY_HIGH, PRIORITY_LOW, AsyncRequestScheduler, RequestScheduler, TokenBucket
+
+STUB_RATE = 5
+STUB_BURST = 2
+STUB_RETRY_AFTER = 1
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Answers 429 once the client exceeds STUB_RATE requests per second"""
+    lock = threading.Lock()
+    bucket = None
+    served = []
+    rejected = 0
+
+    def do_GET(self):
+        with self.lock:
+            now = time.monotonic()
+            allowed = self.bucket.delay(now) == 0
+            if allowed:
+                self.bucket.take(now)
+                type(self).served.append(self.path)
+            else:
+                type(self).rejected += 1
+
+        if allowed:
+            self.send_response(200)
+            self.send_header('Content-Length', '2')
+            self.end_headers()
+            self.wfile.write(b'{}')
+        else:
+            self.send_response(429)
+            self.send_header('Retry-After', str(STUB_RETRY_AFTER))
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_stub():
+    StubHandler.bucket = TokenBucket(STUB_RATE, STUB_BURST)
+    StubHandler.served = []
+    StubHandler.rejected = 0
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def run_requests(rate, burst, count=15, workers=8):
+    """Send count parallel requests through a scheduler with the given limit"""
+    server = start_stub()
+    host = '127.0.0.1'
+    scheduler = RequestScheduler(requests.Session(), {host: (rate, burst)})
+    base_url = f"http://{host}:{server.server_address[1]}"
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            responses = list(executor.map(lambda i: scheduler.get(f"{base_url}/{i}"), range(count)))
+    finally:
+        server.shutdown()
+        server.server_close()
+    return responses, scheduler.stats()[host]
+
+
+def check_within_limit():
+    """A scheduler configured below the stub's limit is never rejected"""
+    responses, stats = run_requests(rate=STUB_RATE * 0.8, burst=STUB_BURST)
+    assert all(r.status_code == 200 for r in responses), "Some requests failed"
+    assert StubHandler.rejected == 0, f"Stub rejected {StubHandler.rejected} requests"
+    print(f"✅ Within limit: {stats['requests']} requests, none rejected, max queue depth {stats['max_queue_depth']}, "
+          f"max wait {stats['max_wait']:.2f}s")
+
+
+def check_retry_after():
+    """A scheduler configured above the stub's limit honors Retry-After and still succeeds"""
+    responses, stats = run_requests(rate=STUB_RATE * 4, burst=STUB_BURST * 4)
+    assert all(r.status_code == 200 for r in responses), "Some requests failed after retrying"
+    assert StubHandler.rejected > 0, "The stub should have rejected requests"
+    assert stats['throttled'] > 0, "The scheduler should have been throttled"
+    print(f"✅ Over limit: {StubHandler.rejected} rejected by the stub, all {len(responses)} requests succeeded "
+          f"after Retry-After, waited up to {stats['max_wait']:.2f}s")
+
+
+def check_priority():
+    """Requests with a higher priority are sent first once the limit is reached"""
+    server = start_stub()
+    host = '127.0.0.1'
+    scheduler = RequestScheduler(requests.Session(), {host: (STUB_RATE * 0.8, 1)})
+    base_url = f"http://{host}:{server.server_address[1]}"
+    try:
+        # Use up the burst so the following requests have to queue
+        scheduler.get(f"{base_url}/first")
+        with ThreadPoolExecutor(max_workers=6) as executor:
+            futures = [executor.submit(scheduler.get, f"{base_url}/low{i}", PRIORITY_LOW) for i in range(3)]
+            time.sleep(0.05)
+            futures += [executor.submit(scheduler.get, f"{base_url}/high{i}", PRIORITY_HIGH) for i in range(2)]
+            for future in futures:
+                future.result()
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    # The first low priority request may already be waiting for the bucket, the rest must follow the high ones
+    order = StubHandler.served[1:]
+    assert order.index('/high1') < max(order.index(f'/low{i}') for i in range(3)), f"Unexpected order: {order}"
+    print(f"✅ Priority: served in order {', '.join(order)}")
+
+
+def check_async_retry_after(count=15):
+    """The async scheduler shares the limits and Retry-After handling on one event loop"""
+    server = start_stub()
+    host = '127.0.0.1'
+    scheduler = AsyncRequestScheduler(None, {host: (STUB_RATE * 4, STUB_BURST * 4)})
+    base_url = f"http://{host}:{server.server_address[1]}"
+
+    async def send_all():
+        async with httpx.AsyncClient() as client:
+            scheduler.session = client
+            return await asyncio.gather(*(scheduler.get(f"{base_url}/{i}") for i in range(count)))
+
+    try:
+        responses = asyncio.run(send_all())
+    finally:
+        server.shutdown()
+        server.server_close()
+    stats = scheduler.stats()[host]
+    assert all(r.status_code == 200 for r in responses), "Some async requests failed after retrying"
+    assert stats['throttled'] > 0, "The async scheduler should have been throttled"
+    print(f"✅ Async: {StubHandler.rejected} rejected by the stub, all {len(responses)} requests succeeded "
+          f"after Retry-After, waited up to {stats['max_wait']:.2f}s")
+
+
+def check_async_cancelled_waiter():
+    """A request cancelled while queued does not block the requests behind it"""
+    server = start_stub()
+    host = '127.0.0.1'
+    scheduler = AsyncRequestScheduler(None, {host: (STUB_RATE * 0.8, 1)})
+    base_url = f"http://{host}:{server.server_address[1]}"
+
+    async def cancel_one():
+        async with httpx.AsyncClient() as client:
+            scheduler.session = client
+            # Use up the burst so the next request has to queue
+            await scheduler.get(f"{base_url}/first")
+            queued = asyncio.create_task(scheduler.get(f"{base_url}/cancelled"))
+            await asyncio.sleep(0.05)
+            queued.cancel()
+            await asyncio.gather(queued, return_exceptions=True)
+            return await asyncio.wait_for(scheduler.get(f"{base_url}/next"), 5)
+
+    try:
+        response = asyncio.run(cancel_one())
+    finally:
+        server.shutdown()
+        server.server_close()
+    stats = scheduler.stats()[host]
+    assert response.status_code == 200, "The request after the cancelled one failed"
+    assert '/cancelled' not in StubHandler.served, "The cancelled request was sent"
+    assert stats['queue_depth'] == 0, f"{stats['queue_depth']} requests left in the queue"
+    print("✅ Cancelled: a request cancelled while queued left the queue, the next one was sent")
+
+
+def test_scheduler_against_stub():
+    check_within_limit()
+    check_retry_after()
+    check_priority()
+    check_async_retry_after()
+    check_async_cancelled_waiter()
+
+
+if __name__ == "__main__":
+    print("🚀 Testing the request scheduler against a rate limited stub...")
+    test_scheduler_against_stub()
+    print("🎉 The request scheduler respects the rate limits!")
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Test script for the retention policy
+Compacts a synthetic history and checks what is kept, what is dropped and
+that records appended while compacting survive
+"""
+
+import os
+import tempfile
+import threading
+
+from order_history import append_history, iter_history
+from retention import SECONDS_PER_DAY, compact_history, state_file
+
+NOW = 200 * SECONDS_PER_DAY
+FULL_HISTORY_DAYS = 30
+
+
+def detailed_order(reference_number, status='BOOKED', window='Oct 1'):
+    return {
+        'order': {'referenceNumber': reference_number, 'orderStatus': status, 'modelCode': 'my', 'countryCode': 'DE'},
+        'details': {'tasks': {'scheduling': {'deliveryWindowDisplay': window}}},
+    }
+
+
+def write_history(history_file, days=90):
+    """Hourly records of RN0 (window changes every 20 days), RN1 (never changes) and RN2 (delivered on day 60)"""
+    for hour in range(days * 24, 0, -1):
+        timestamp = NOW - hour * 3600
+        day = (NOW - timestamp) // SECONDS_PER_DAY
+        append_history([
+            detailed_order('RN0', window=f'window {day // 20}'),
+            detailed_order('RN1'),
+            detailed_order('RN2', status='DELIVERED' if day <= 60 else 'BOOKED'),
+        ], timestamp=timestamp, history_file=history_file)
+
+
+def records_by_order(history_file):
+    history = {}
+    for record in iter_history(history_file):
+        history.setdefault(record['referenceNumber'], []).append(record)
+    return history
+
+
+def check_compaction(history_file):
+    """Old records keep every change plus one checkpoint per day, recent records stay complete"""
+    cutoff = NOW - FULL_HISTORY_DAYS * SECONDS_PER_DAY
+    read, kept = compact_history(history_file, FULL_HISTORY_DAYS, purged={'RN2'}, now=NOW)
+    history = records_by_order(history_file)
+    assert kept < read, "Nothing was compacted"
+
+    for reference_number in ('RN0', 'RN1'):
+        old = [r for r in history[reference_number] if r['ts'] < cutoff]
+        recent = [r for r in history[reference_number] if r['ts'] >= cutoff]
+        old_days = [r['ts'] // SECONDS_PER_DAY for r in old]
+        assert len(recent) == FULL_HISTORY_DAYS * 24, f"{reference_number}: recent records were dropped"
+        assert len(old_days) - len(set(old_days)) <= 3, f"{reference_number}: more than one record per day kept"
+
+    windows = [r['deliveryWindow'] for r in history['RN0']]
+    assert sorted(set(windows)) == [f'window {i}' for i in range(5)], "A change of RN0 was lost"
+
+    # The purged order keeps its status change, but no hourly records, also not recent ones
+    statuses = [r['orderStatus'] for r in history['RN2']]
+    assert statuses.index('DELIVERED') > 0 and 'BOOKED' in statuses, "The delivery of RN2 was lost"
+    assert len(history['RN2']) <= 91, f"RN2 kept {len(history['RN2'])} records"
+    print(f"✅ Compaction: {read} records compacted to {kept}, changes and daily checkpoints kept")
+
+
+def check_incremental(history_file):
+    """A second run only reads the records after the compacted part"""
+    size = os.path.getsize(history_file)
+    read, kept = compact_history(history_file, FULL_HISTORY_DAYS, purged={'RN2'}, now=NOW)
+    assert os.path.exists(state_file(history_file)), "The compacted offset was not saved"
+    cutoff = NOW - FULL_HISTORY_DAYS * SECONDS_PER_DAY
+    recent = sum(1 for record in iter_history(history_file) if record['ts'] >= cutoff)
+    assert read == kept == recent, f"Expected only the {recent} recent records to be read, read {read}"
+    assert os.path.getsize(history_file) == size, "An already compacted history was rewritten"
+
+    # A day later the oldest recent day is compacted too
+    read, kept = compact_history(history_file, FULL_HISTORY_DAYS, purged={'RN2'}, now=NOW + SECONDS_PER_DAY)
+    assert read - kept == 2 * 23, f"Expected one day of two orders to be compacted, removed {read - kept}"
+    print(f"✅ Incremental: the next run read {read} records past the compacted part")
+
+
+def check_concurrent_append(history_file):
+    """Records appended while the history is rewritten are not lost"""
+    os.remove(state_file(history_file))
+    appended = []
+    stop = threading.Event()
+
+    def poller():
+        while not stop.is_set():
+            timestamp = NOW + len(appended) + 1
+            append_history([detailed_order('RN9', window='live')], timestamp=timestamp, history_file=history_file)
+            appended.append(timestamp)
+
+    thread = threading.Thread(target=poller)
+    thread.start()
+    try:
+        compact_history(history_file, 1, now=NOW)
+    finally:
+        stop.set()
+        thread.join()
+
+    live = [r['ts'] for r in iter_history(history_file) if r['referenceNumber'] == 'RN9']
+    assert live == appended, f"{len(appended) - len(live)} of {len(appended)} appended records were lost"
+    print(f"✅ Concurrent appends: all {len(appended)} records appended while compacting survived")
+
+
+def test_retention():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        history_file = os.path.join(tmp_dir, 'history.jsonl')
+        write_history(history_file)
+        check_compaction(history_file)
+        check_incremental(history_file)
+        check_concurrent_append(history_file)
+
+
+if __name__ == "__main__":
+    print("🚀 Testing the retention policy on a synthetic history...")
+    test_retention()
+    print("🎉 Retention keeps what matters!")
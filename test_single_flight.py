@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Test script for the single flight
+Runs concurrent callers against a slow stub call and checks how many calls
+reach upstream, what is shared and cached, and that errors and cancellations
+of one caller do not leak to the others
+"""
+
+import asyncio
+
+from single_flight import AsyncSingleFlight
+
+CALL_DELAY = 0.05
+
+
+class StubUpstream:
+    """Counts calls and answers after CALL_DELAY"""
+
+    def __init__(self, fail=False):
+        self.calls = 0
+        self.fail = fail
+
+    async def fetch(self, key):
+        self.calls += 1
+        await asyncio.sleep(CALL_DELAY)
+        if self.fail:
+            raise ValueError(f"upstream failed for {key}")
+        return f"{key}:{self.calls}"
+
+
+def check_deduplication():
+    """Concurrent callers of the same key share one upstream call"""
+    flight = AsyncSingleFlight()
+    upstream = StubUpstream()
+
+    async def run():
+        return await asyncio.gather(*(flight.do('RN1', upstream.fetch, 'RN1') for _ in range(5)),
+                                    flight.do('RN2', upstream.fetch, 'RN2'))
+
+    results = asyncio.run(run())
+    assert upstream.calls == 2, f"Expected 2 upstream calls, got {upstream.calls}"
+    assert len(set(results[:5])) == 1, f"Callers of RN1 got different results: {results[:5]}"
+    stats = flight.stats()
+    assert stats == {'upstream_calls': 2, 'shared_calls': 4, 'cache_hits': 0, 'saved_calls': 4}, stats
+    print(f"✅ Deduplication: 6 callers, {upstream.calls} upstream calls, {stats['saved_calls']} saved")
+
+
+def check_ttl():
+    """Results are reused within the TTL and fetched again after it"""
+    flight = AsyncSingleFlight(ttl=CALL_DELAY * 2)
+    upstream = StubUpstream()
+
+    async def run():
+        first = await flight.do('RN1', upstream.fetch, 'RN1')
+        cached = await flight.do('RN1', upstream.fetch, 'RN1')
+        await asyncio.sleep(CALL_DELAY * 3)
+        expired = await flight.do('RN1', upstream.fetch, 'RN1')
+        return first, cached, expired
+
+    first, cached, expired = asyncio.run(run())
+    assert cached == first, "A result within the TTL was fetched again"
+    assert expired != first, "An expired result was reused"
+    stats = flight.stats()
+    assert stats['upstream_calls'] == 2 and stats['cache_hits'] == 1, stats
+    print(f"✅ TTL: {stats['cache_hits']} cache hit within the TTL, fetched again after it")
+
+
+def check_errors_not_cached():
+    """An error is shared with the waiting callers but the next call tries again"""
+    flight = AsyncSingleFlight()
+    upstream = StubUpstream(fail=True)
+
+    async def run():
+        results = await asyncio.gather(*(flight.do('RN1', upstream.fetch, 'RN1') for _ in range(3)),
+                                       return_exceptions=True)
+        upstream.fail = False
+        return results, await flight.do('RN1', upstream.fetch, 'RN1')
+
+    results, retried = asyncio.run(run())
+    assert all(isinstance(r, ValueError) for r in results), f"Unexpected results: {results}"
+    assert upstream.calls == 2, f"Expected the failed call to be made again, got {upstream.calls} calls"
+    assert retried == 'RN1:2', f"Unexpected result after the error: {retried}"
+    print("✅ Errors: shared with 2 waiting callers, not cached")
+
+
+def check_cancelled_owner():
+    """Cancelling the caller making the call does not cancel the callers waiting for it"""
+    flight = AsyncSingleFlight()
+    upstream = StubUpstream()
+
+    async def run():
+        owner = asyncio.create_task(flight.do('RN1', upstream.fetch, 'RN1'))
+        await asyncio.sleep(0)
+        waiters = [asyncio.create_task(flight.do('RN1', upstream.fetch, 'RN1')) for _ in range(2)]
+        await asyncio.sleep(CALL_DELAY / 2)
+        owner.cancel()
+        return await asyncio.gather(owner, *waiters, return_exceptions=True)
+
+    owner, *waiters = asyncio.run(run())
+    assert isinstance(owner, asyncio.CancelledError), f"The owner was not cancelled: {owner}"
+    assert waiters == ['RN1:2', 'RN1:2'], f"Waiters did not get the repeated call: {waiters}"
+    stats = flight.stats()
+    assert stats['upstream_calls'] == 2 and stats['shared_calls'] == 1, stats
+    print("✅ Cancellation: the waiting callers made the call again and shared it")
+
+
+def test_single_flight():
+    check_deduplication()
+    check_ttl()
+    check_errors_not_cached()
+    check_cancelled_owner()
+
+
+if __name__ == "__main__":
+    print("🚀 Testing the single flight against a slow stub...")
+    test_single_flight()
+    print("🎉 The single flight shares calls safely!")
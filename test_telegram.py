@@ -5,23 +5,23 @@ Run this to test if your Telegram bot configuration works
 """
 
 import asyncio
-import json
 from telegram import Bot
 from telegram.error import TelegramError
 
+from app_config import CONFIG_FILE, ConfigError, load_config
+
 def load_telegram_config():
     """Load Telegram configuration from file"""
     try:
-        with open('telegram_config.json', 'r') as f:
-            config = json.load(f)
-        return config
-    except FileNotFoundError:
-        print("❌ telegram_config.json not found. Please create it first.")
-        return None
-    except json.JSONDecodeError:
-        print("❌ Invalid JSON in telegram_config.json")
+        config = load_config(CONFIG_FILE)
+    except ConfigError as e:
+        print(f"❌ {e}")
         return None
 
+    if not config.telegram:
+        print(f"❌ {config.telegram_config_file} not found or missing bot_token/chat_id. Please create it first.")
+    return config.telegram
+
 async def test_telegram():
     """Test sending a message to Telegram"""
     config = load_telegram_config()
@@ -29,16 +29,12 @@ async def test_telegram():
         return False
     
     # Check if notifications are enabled
-    if not config.get('enabled', True):
+    if not config.enabled:
         print("ℹ️ Telegram notifications are disabled in configuration")
         return True
     
-    bot_token = config.get('bot_token')
-    chat_id = config.get('chat_id')
-    
-    if not bot_token or not chat_id:
-        print("❌ Missing bot_token or chat_id in configuration")
-        return False
+    bot_token = config.bot_token
+    chat_id = config.chat_id
     
     try:
         bot = Bot(token=bot_token)
@@ -53,7 +49,7 @@ async def test_telegram():
         await asyncio.sleep(1)
         
         print("📱 Testing no-change notification message...")
-        if config.get('always_notify', False):
+        if config.always_notify:
             # Show what a full order details message would look like
             no_change_message = """🚗 <b>Tesla Order Status Report</b>
 📅 2025-09-22 20:50:00
@@ -75,9 +71,9 @@ async def test_telegram():
         
         # Show current configuration
         print(f"\n📋 Current configuration:")
-        print(f"   Enabled: {config.get('enabled', True)}")
-        print(f"   Always notify: {config.get('always_notify', False)}")
-        if config.get('always_notify', False):
+        print(f"   Enabled: {config.enabled}")
+        print(f"   Always notify: {config.always_notify}")
+        if config.always_notify:
             print(f"   📱 When always_notify=true: Full order details will be sent")
         else:
             print(f"   📱 When always_notify=false: Only change notifications are sent")